@@ -0,0 +1,286 @@
+"""
+Reduced ordered binary decision diagrams (BDDs) for the logic modules.
+
+A knowledge base is compiled once into a BDD. After that, each entailment
+query is a single pass over the two diagrams and the number of models is
+counted exactly, without enumerating assignments. Nodes are hash-consed in
+a unique table, operations are memoized in a computed table, and a node
+limit keeps memory bounded.
+"""
+
+from sat import sequential_counter
+
+FALSE = 0
+TRUE = 1
+
+# Number of computed-table entries kept before the table is cleared
+CACHE_LIMIT = 1 << 20
+
+
+class NodeLimitError(Exception):
+    pass
+
+
+def appearance_order(sentence):
+    """Orders symbols by their first appearance, reading left to right."""
+    order = {}
+    visited = set()
+    stack = [sentence]
+    while stack:
+        sentence = stack.pop()
+        if id(sentence) in visited:
+            continue
+        visited.add(id(sentence))
+        operands = sentence.operands()
+        if operands:
+            stack.extend(reversed(operands))
+        else:
+            order.update(dict.fromkeys(sorted(sentence.symbols())))
+    return list(order)
+
+
+def force_order(sentence, iterations=20):
+    """
+    Orders symbols with the FORCE heuristic: the symbols of each top-level
+    operand form a hyperedge, and every symbol is repeatedly moved to the
+    average centre of the hyperedges it is in, keeping the best order seen.
+    """
+    order = appearance_order(sentence)
+    edges = [list(operand.symbols()) for operand in sentence.operands() or (sentence,)]
+    edges = [edge for edge in edges if len(edge) > 1]
+
+    def span(position):
+        return sum(
+            max(position[name] for name in edge) - min(position[name] for name in edge)
+            for edge in edges
+        )
+
+    position = {name: i for i, name in enumerate(order)}
+    best, best_span = order, span(position)
+    for _ in range(iterations):
+        total = dict.fromkeys(order, 0.0)
+        count = dict.fromkeys(order, 0)
+        for edge in edges:
+            centre = sum(position[name] for name in edge) / len(edge)
+            for name in edge:
+                total[name] += centre
+                count[name] += 1
+        order = sorted(
+            order,
+            key=lambda name: (
+                total[name] / count[name] if count[name] else position[name]
+            ),
+        )
+        position = {name: i for i, name in enumerate(order)}
+        if span(position) < best_span:
+            best, best_span = order, span(position)
+    return best
+
+
+ORDERINGS = {
+    "appearance": appearance_order,
+    "force": force_order,
+}
+
+
+class BDD:
+    """
+    A BDD compiled from a knowledge base.
+
+    Nodes are integers: FALSE and TRUE are the terminals, and every other
+    node tests the variable at level var[node], continuing at low[node]
+    when it is false and high[node] when it is true. Also implements the
+    algebra used by `Sentence.fold`, interpreting sentences as nodes.
+    """
+
+    def __init__(self, knowledge, ordering="force", max_nodes=1000000):
+        if callable(ordering):
+            ordering = ordering(knowledge)
+        elif isinstance(ordering, str):
+            ordering = ORDERINGS[ordering](knowledge)
+
+        self.order = []
+        self.level = {}
+        for name in ordering:
+            self.declare(name)
+        self.symbols = knowledge.symbols()
+
+        # Terminals sit below every variable
+        self.var = [float("inf"), float("inf")]
+        self.low = [FALSE, TRUE]
+        self.high = [FALSE, TRUE]
+
+        self.max_nodes = max_nodes
+        self.unique = {}
+        self.cache = {}
+        self.root = self.build(knowledge)
+
+    def declare(self, name):
+        """Places the symbol called name below all declared symbols."""
+        if name not in self.level:
+            self.level[name] = len(self.order)
+            self.order.append(name)
+
+    def node(self, level, low, high):
+        """Returns the unique node for (level, low, high)."""
+        if low == high:
+            return low
+        key = (level, low, high)
+        node = self.unique.get(key)
+        if node is None:
+            if len(self.var) >= self.max_nodes:
+                raise NodeLimitError(f"BDD exceeds {self.max_nodes} nodes")
+            node = len(self.var)
+            self.var.append(level)
+            self.low.append(low)
+            self.high.append(high)
+            self.unique[key] = node
+        return node
+
+    def cofactors(self, node, level):
+        if self.var[node] == level:
+            return self.low[node], self.high[node]
+        return node, node
+
+    def ite(self, f, g, h):
+        """
+        Returns the node for (f ∧ g) ∨ (¬f ∧ h). Calls still to be made
+        are kept on a stack, each followed by the node to build from the
+        two results before it, so deep diagrams cannot exceed the
+        recursion limit.
+        """
+        results = []
+        stack = [(f, g, h)]
+        while stack:
+            item = stack.pop()
+            if len(item) == 2:
+                key, level = item
+                high = results.pop()
+                low = results.pop()
+                result = self.node(level, low, high)
+                if len(self.cache) >= CACHE_LIMIT:
+                    self.cache.clear()
+                self.cache[key] = result
+                results.append(result)
+                continue
+
+            f, g, h = item
+            if f == TRUE or g == h:
+                results.append(g)
+            elif f == FALSE:
+                results.append(h)
+            elif g == TRUE and h == FALSE:
+                results.append(f)
+            elif item in self.cache:
+                results.append(self.cache[item])
+            else:
+                level = min(self.var[f], self.var[g], self.var[h])
+                f0, f1 = self.cofactors(f, level)
+                g0, g1 = self.cofactors(g, level)
+                h0, h1 = self.cofactors(h, level)
+                stack.append((item, level))
+                stack.append((f1, g1, h1))
+                stack.append((f0, g0, h0))
+        return results[0]
+
+    def build(self, sentence):
+        """Returns the node for sentence."""
+        return sentence.fold(self)
+
+    def symbol(self, name):
+        self.declare(name)
+        return self.node(self.level[name], FALSE, TRUE)
+
+    def negation(self, node):
+        return self.ite(node, FALSE, TRUE)
+
+    def conjunction(self, nodes):
+        result = TRUE
+        for node in nodes:
+            result = self.ite(result, node, FALSE)
+        return result
+
+    def disjunction(self, nodes):
+        result = FALSE
+        for node in nodes:
+            result = self.ite(result, TRUE, node)
+        return result
+
+    def implication(self, antecedent, consequent):
+        return self.ite(antecedent, consequent, TRUE)
+
+    def biconditional(self, left, right):
+        return self.ite(left, right, self.negation(right))
+
+    def cardinality(self, nodes, low, high):
+        return sequential_counter(self, nodes, low, high)
+
+    def implies(self, f, g):
+        """Checks that f ∧ ¬g has no models, without building any nodes."""
+        checked = set()
+        stack = [(f, g)]
+        while stack:
+            f, g = stack.pop()
+            if f == FALSE or g == TRUE or f == g or (f, g) in checked:
+                continue
+            if g == FALSE and f == TRUE:
+                return False
+            checked.add((f, g))
+            level = min(self.var[f], self.var[g])
+            f0, f1 = self.cofactors(f, level)
+            g0, g1 = self.cofactors(g, level)
+            stack.append((f0, g0))
+            stack.append((f1, g1))
+        return True
+
+    def entails(self, query):
+        """Checks if the knowledge base entails query."""
+        return self.implies(self.root, self.build(query))
+
+    def count(self):
+        """Returns the number of models of the knowledge base."""
+        # Position of each level among the symbols of the knowledge base.
+        # Other declared symbols, from the ordering or queries, are skipped
+        rank = []
+        counted = 0
+        for name in self.order:
+            rank.append(counted)
+            if name in self.symbols:
+                counted += 1
+
+        def level(node):
+            return counted if node <= TRUE else rank[self.var[node]]
+
+        # Models of the variables from a node's level down, bottom-up
+        paths = {FALSE: 0, TRUE: 1}
+        for node in sorted(self.reachable(), key=level, reverse=True):
+            if node not in paths:
+                skipped_low = level(self.low[node]) - level(node) - 1
+                skipped_high = level(self.high[node]) - level(node) - 1
+                paths[node] = (
+                    paths[self.low[node]] * 2**skipped_low
+                    + paths[self.high[node]] * 2**skipped_high
+                )
+        return paths[self.root] * 2 ** level(self.root)
+
+    def reachable(self):
+        """Returns the set of nodes reachable from the root."""
+        nodes = set()
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            if node not in nodes:
+                nodes.add(node)
+                if node > TRUE:
+                    stack.append(self.low[node])
+                    stack.append(self.high[node])
+        return nodes
+
+    def size(self):
+        """Returns the number of nodes in the knowledge base's diagram."""
+        return len(self.reachable())
+
+
+def entails(knowledge, query, ordering="force"):
+    """Checks if knowledge entails query by compiling both into BDDs."""
+    return BDD(knowledge, ordering).entails(query)
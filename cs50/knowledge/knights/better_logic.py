@@ -1,17 +1,230 @@
-from dataclasses import dataclass, field
+import weakref
+from dataclasses import dataclass, field, fields
 from termcolor import cprint
 
+import bdd
+import codegen
+import preprocess
+import sat
+from bdd import BDD
+from cache import EntailmentCache
+from sat import KnowledgeBase
+from symbol_table import SymbolTable
 
-@dataclass(eq=True, frozen=True)
+MAX_RECURSION_DEPTH = 200
+
+
+@dataclass(eq=False, frozen=True)
 class Sentence:
+    def __post_init__(self):
+        # Operands are replaced by their shared, interned nodes
+        attributes = vars(self)
+        for name in self.__dataclass_fields__:
+            value = attributes[name]
+            if isinstance(value, Sentence):
+                attributes[name] = intern(value)
+            elif isinstance(value, list):
+                attributes[name] = [intern(operand) for operand in value]
+
+        # Hash and size are cached once, as the node is built. Symbols are
+        # gathered on demand, see collect_symbols
+        operands = self.operands()
+        attributes.update(
+            _shared=False,
+            _interned=False,
+            _hash=None,
+            _symbols=None,
+            _size=1 + sum([operand._size for operand in operands]),
+            _depth=1 + max([operand._depth for operand in operands], default=0),
+            _compiled=None,
+        )
+        hash(self)
+
+    def __eq__(self, other) -> bool:
+        return self is other or (
+            type(self) is type(other) and self.structure() == other.structure()
+        )
+
+    def __hash__(self) -> int:
+        if self._hash is None:
+            object.__setattr__(
+                self,
+                "_hash",
+                hash((type(self).__name__, *[hash(op) for op in self.operands()])),
+            )
+        return self._hash
+
+    def structure(self) -> tuple:
+        return (type(self), *[id(operand) for operand in self.operands()])
+
+    def size(self) -> int:
+        return self._size
+
+    def extend(self, operands: list, operand: "Sentence") -> "Sentence":
+        # A sentence used as an operand stays as it is, and a copy with
+        # operand appended is returned instead
+        if self._shared:
+            values = [getattr(self, f.name) for f in fields(self)]
+            return type(self)(
+                *[
+                    operands + [operand] if value is operands else value
+                    for value in values
+                ]
+            )
+        operand = intern(operand)
+        operands.append(operand)
+        object.__setattr__(self, "_hash", None)
+        if self._symbols is not None:
+            self._symbols.update(operand.collect_symbols())
+        object.__setattr__(self, "_size", self._size + operand._size)
+        object.__setattr__(self, "_depth", max(self._depth, operand._depth + 1))
+        object.__setattr__(self, "_compiled", None)
+        return self
+
+    def __reduce__(self):
+        # A flat list of nodes, operands first, so deep sentences do not
+        # exceed the recursion limit. Each node is rebuilt through its
+        # constructor, so unpickled operands are interned
+        nodes = []
+        index = {}
+
+        def reference(value):
+            if isinstance(value, Sentence):
+                return ("operand", index[id(value)])
+            if isinstance(value, list):
+                return ("operands", [index[id(operand)] for operand in value])
+            return ("value", value)
+
+        stack = [self]
+        while stack:
+            sentence = stack[-1]
+            if id(sentence) in index:
+                stack.pop()
+                continue
+            pending = [
+                operand for operand in sentence.operands() if id(operand) not in index
+            ]
+            if pending:
+                stack.extend(pending)
+            else:
+                stack.pop()
+                index[id(sentence)] = len(nodes)
+                nodes.append(
+                    (
+                        type(sentence),
+                        [
+                            reference(getattr(sentence, f.name))
+                            for f in fields(sentence)
+                        ],
+                    )
+                )
+        return (rebuild, (nodes,))
+
+    def compile(self, symbols=None, bitmask: bool = False):
+        symbols = tuple(sorted(self.symbols()) if symbols is None else symbols)
+        if self._compiled is None:
+            object.__setattr__(self, "_compiled", {})
+        if (symbols, bitmask) not in self._compiled:
+            self._compiled[symbols, bitmask] = codegen.compile_sentence(
+                self, symbols, bitmask
+            )
+        return self._compiled[symbols, bitmask]
+
     def evaluate(self, model) -> bool:
+        if self._depth > MAX_RECURSION_DEPTH:
+            return self.fold(Evaluation(model))
+        return self.holds(model)
+
+    def holds(self, model) -> bool:
         raise Exception("nothing to evaluate")
 
     def formula(self) -> str:
-        return ""
+        pieces = []
+        stack = [self]
+        while stack:
+            item = stack.pop()
+            if isinstance(item, str):
+                pieces.append(item)
+            else:
+                stack.extend(reversed(item.layout()))
+        return "".join(pieces)
+
+    def layout(self) -> list:
+        return []
+
+    def needs_parentheses(self) -> bool | None:
+        return True
 
     def symbols(self) -> set:
-        return set()
+        if self._symbols is None:
+            object.__setattr__(self, "_symbols", self.collect_symbols())
+        return set(self._symbols)
+
+    def collect_symbols(self) -> set:
+        # One pass over the DAG, cached only by the sentence asked
+        names = set()
+        visited = set()
+        stack = [self]
+        while stack:
+            sentence = stack.pop()
+            if id(sentence) in visited:
+                continue
+            visited.add(id(sentence))
+            if sentence._symbols is not None:
+                names.update(sentence._symbols)
+            else:
+                stack.extend(sentence.operands())
+        return names
+
+    def operands(self) -> tuple:
+        return ()
+
+    def combine(self, algebra, values: list):
+        raise Exception("nothing to combine")
+
+    def builder(self) -> "Builder":
+        return builder
+
+    def evaluate_bits(self, table):
+        return self.fold(table)
+
+    def fold(self, algebra):
+        values = {}
+        stack = [self]
+        while stack:
+            sentence = stack[-1]
+            if id(sentence) in values:
+                stack.pop()
+                continue
+            pending = [
+                operand for operand in sentence.operands() if id(operand) not in values
+            ]
+            if pending:
+                stack.extend(pending)
+            else:
+                stack.pop()
+                values[id(sentence)] = sentence.combine(
+                    algebra, [values[id(operand)] for operand in sentence.operands()]
+                )
+        return values[id(self)]
+
+    @classmethod
+    def wrap(cls, sentence: "Sentence") -> list:
+        inner = sentence
+        needed = inner.needs_parentheses()
+        while needed is None:
+            inner = inner.operands()[0]
+            needed = inner.needs_parentheses()
+        return ["(", sentence, ")"] if needed else [sentence]
+
+    @classmethod
+    def join(cls, separator: str, operands) -> list:
+        layout = []
+        for operand in operands:
+            if layout:
+                layout.append(separator)
+            layout.extend(Sentence.wrap(operand))
+        return layout
 
     @classmethod
     def parenthesize(cls, s) -> str:
@@ -35,126 +248,322 @@ class Sentence:
         return f"({s})"
 
 
-@dataclass(eq=True, frozen=True)
+@dataclass(eq=False, frozen=True)
 class Symbol(Sentence):
     name: str
 
-    def formula(self) -> str:
-        return self.name
+    def __post_init__(self):
+        super().__post_init__()
+        object.__setattr__(self, "_symbols", {self.name})
+        object.__setattr__(self, "id", symbol_table.id(self.name))
 
-    def evaluate(self, model) -> bool:
+    def __hash__(self) -> int:
+        if self._hash is None:
+            object.__setattr__(self, "_hash", hash((type(self).__name__, self.name)))
+        return self._hash
+
+    def structure(self) -> tuple:
+        return (type(self), self.name)
+
+    def layout(self) -> list:
+        return [self.name]
+
+    def needs_parentheses(self) -> bool:
+        return Sentence.parenthesize(self.name) != self.name
+
+    def holds(self, model) -> bool:
+        if type(model) is int:
+            return bool(model >> self.id & 1)
         return bool(model[self.name])
 
-    def symbols(self) -> set:
-        return {self.name}
+    def combine(self, algebra, values: list):
+        return algebra.symbol(self.name)
 
 
-@dataclass(eq=True, frozen=True)
+@dataclass(eq=False, frozen=True)
 class Not(Sentence):
     operand: Sentence
 
-    def formula(self) -> str:
-        return "¬" + Sentence.parenthesize(self.operand.formula())
+    def layout(self) -> list:
+        return ["¬", *Sentence.wrap(self.operand)]
 
-    def evaluate(self, model) -> bool:
-        return not self.operand.evaluate(model)
+    def holds(self, model) -> bool:
+        return not self.operand.holds(model)
 
-    def symbols(self) -> set:
-        return self.operand.symbols()
+    def operands(self) -> tuple:
+        return (self.operand,)
+
+    def combine(self, algebra, values: list):
+        return algebra.negation(values[0])
 
 
-@dataclass(eq=True, frozen=True)
+@dataclass(eq=False, frozen=True)
 class And(Sentence):
     conjuctions: list[Sentence] = field()
 
-    def add(self, conjuction: Sentence) -> None:
-        self.conjuctions.append(conjuction)
+    def add(self, conjuction: Sentence) -> "And":
+        return self.extend(self.conjuctions, conjuction)
 
-    def formula(self) -> str:
-        return " ^ ".join(
-            [
-                Sentence.parenthesize(conjuction.formula())
-                for conjuction in self.conjuctions
-            ]
-        )
+    def layout(self) -> list:
+        return Sentence.join(" ^ ", self.conjuctions)
 
-    def evaluate(self, model) -> bool:
-        return all(conjunction.evaluate(model) for conjunction in self.conjuctions)
+    def needs_parentheses(self) -> bool | None:
+        if len(self.conjuctions) == 1:
+            return None
+        return len(self.conjuctions) > 1
 
-    def symbols(self) -> set:
-        return set.union(*[conjuction.symbols() for conjuction in self.conjuctions])
+    def holds(self, model) -> bool:
+        return all(conjunction.holds(model) for conjunction in self.conjuctions)
+
+    def operands(self) -> tuple:
+        return tuple(self.conjuctions)
 
+    def combine(self, algebra, values: list):
+        return algebra.conjunction(values)
 
-@dataclass(eq=True, frozen=True)
+
+@dataclass(eq=False, frozen=True)
 class Or(Sentence):
     disjunctions: list[Sentence] = field()
 
-    def add(self, disjunction: Sentence):
-        self.disjunctions.append(disjunction)
+    def add(self, disjunction: Sentence) -> "Or":
+        return self.extend(self.disjunctions, disjunction)
 
-    def formula(self) -> str:
-        return " v ".join(
-            [
-                Sentence.parenthesize(disjunction.formula())
-                for disjunction in self.disjunctions
-            ]
-        )
+    def layout(self) -> list:
+        return Sentence.join(" v ", self.disjunctions)
 
-    def evaluate(self, model) -> bool:
-        return any(disjunction.evaluate(model) for disjunction in self.disjunctions)
+    def needs_parentheses(self) -> bool | None:
+        if len(self.disjunctions) == 1:
+            return None
+        return len(self.disjunctions) > 1
 
-    def symbols(self) -> set:
-        return set.union(*[disjunction.symbols() for disjunction in self.disjunctions])
+    def holds(self, model) -> bool:
+        return any(disjunction.holds(model) for disjunction in self.disjunctions)
+
+    def operands(self) -> tuple:
+        return tuple(self.disjunctions)
 
+    def combine(self, algebra, values: list):
+        return algebra.disjunction(values)
 
-@dataclass(eq=True, frozen=True)
+
+@dataclass(eq=False, frozen=True)
 class Implication(Sentence):
     antecedent: Sentence = field()
     consequent: Sentence = field()
 
-    def formula(self) -> str:
-        return f"{Sentence.parenthesize(self.antecedent.formula())} -> {Sentence.parenthesize(self.consequent.formula())}"
+    def layout(self) -> list:
+        return [
+            *Sentence.wrap(self.antecedent),
+            " -> ",
+            *Sentence.wrap(self.consequent),
+        ]
 
-    def evaluate(self, model) -> bool:
-        return (not self.antecedent.evaluate(model)) or (
-            self.consequent.evaluate(model)
-        )
+    def holds(self, model) -> bool:
+        return (not self.antecedent.holds(model)) or (self.consequent.holds(model))
 
-    def symbols(self) -> set:
-        return set.union(self.antecedent.symbols(), self.consequent.symbols())
+    def operands(self) -> tuple:
+        return (self.antecedent, self.consequent)
 
+    def combine(self, algebra, values: list):
+        return algebra.implication(*values)
 
-@dataclass(eq=True, frozen=True)
+
+@dataclass(eq=False, frozen=True)
 class Bidirectional(Sentence):
     left: Sentence = field()
     right: Sentence = field()
 
-    def formula(self):
-        return f"{Sentence.parenthesize(self.left.formula())} <=> {Sentence.parenthesize(self.right.formula())}"
+    def layout(self) -> list:
+        return [*Sentence.wrap(self.left), " <=> ", *Sentence.wrap(self.right)]
 
-    def evaluate(self, model):
-        return (self.left.evaluate(model) and self.right.evaluate(model)) or (
-            not self.left.evaluate(model) and not self.right.evaluate(model)
+    def holds(self, model):
+        return (self.left.holds(model) and self.right.holds(model)) or (
+            not self.left.holds(model) and not self.right.holds(model)
         )
 
-    def symbols(self):
-        return set.union(self.left.symbols(), self.right.symbols())
+    def operands(self) -> tuple:
+        return (self.left, self.right)
+
+    def combine(self, algebra, values: list):
+        return algebra.biconditional(*values)
+
+
+@dataclass(eq=False, frozen=True)
+class Cardinality(Sentence):
+    def __hash__(self) -> int:
+        if self._hash is None:
+            object.__setattr__(
+                self,
+                "_hash",
+                hash((type(self).__name__, self.bounds(), *map(hash, self.terms))),
+            )
+        return self._hash
+
+    def structure(self) -> tuple:
+        return (type(self), self.bounds(), *[id(term) for term in self.terms])
+
+    def bounds(self) -> tuple[int, int]:
+        raise Exception("no bounds")
+
+    def add(self, term: Sentence) -> "Cardinality":
+        return self.extend(self.terms, term)
+
+    def name(self) -> str:
+        return type(self).__name__
+
+    def layout(self) -> list:
+        layout = [f"{self.name()}("]
+        for term in self.terms:
+            if len(layout) > 1:
+                layout.append(", ")
+            layout.append(term)
+        return layout + [")"]
+
+    def holds(self, model) -> bool:
+        low, high = self.bounds()
+        count = 0
+        for term in self.terms:
+            if term.holds(model):
+                count += 1
+                if count > high:
+                    return False
+        return count >= low
+
+    def operands(self) -> tuple:
+        return tuple(self.terms)
+
+    def combine(self, algebra, values: list):
+        return algebra.cardinality(values, *self.bounds())
+
+
+@dataclass(eq=False, frozen=True)
+class ExactlyOne(Cardinality):
+    terms: list[Sentence] = field()
+
+    def bounds(self) -> tuple[int, int]:
+        return (1, 1)
+
+
+@dataclass(eq=False, frozen=True)
+class AtMostK(Cardinality):
+    k: int
+    terms: list[Sentence] = field()
+
+    def name(self) -> str:
+        return f"AtMost{self.k}"
+
+    def bounds(self) -> tuple[int, int]:
+        return (0, self.k)
+
+
+@dataclass(eq=False, frozen=True)
+class AtLeastK(Cardinality):
+    k: int
+    terms: list[Sentence] = field()
+
+    def name(self) -> str:
+        return f"AtLeast{self.k}"
+
+    def bounds(self) -> tuple[int, int]:
+        return (self.k, len(self.terms))
+
+
+class Builder:
+    def symbol(self, name: str) -> Sentence:
+        return Symbol(name)
+
+    def negation(self, operand: Sentence) -> Sentence:
+        return Not(operand)
+
+    def conjunction(self, operands: list) -> Sentence:
+        return And(list(operands))
+
+    def disjunction(self, operands: list) -> Sentence:
+        return Or(list(operands))
+
+    def implication(self, antecedent: Sentence, consequent: Sentence) -> Sentence:
+        return Implication(antecedent, consequent)
 
+    def biconditional(self, left: Sentence, right: Sentence) -> Sentence:
+        return Bidirectional(left, right)
 
-def create_model(symbols, model=dict()):
-    if not symbols:
-        return [model]
+    def cardinality(self, operands: list, low: int, high: int) -> Sentence:
+        if low == high == 1:
+            return ExactlyOne(list(operands))
+        if low <= 0:
+            return AtMostK(high, list(operands))
+        if high >= len(operands):
+            return AtLeastK(low, list(operands))
+        return And([AtLeastK(low, list(operands)), AtMostK(high, list(operands))])
 
-    remaining = symbols.copy()
-    p = remaining.pop()
 
-    model_true = model.copy()
-    model_true[p] = True
+builder = Builder()
 
-    model_false = model.copy()
-    model_false[p] = False
 
-    return create_model(remaining, model_true) + create_model(remaining, model_false)
+class Evaluation:
+    def __init__(self, model):
+        self.model = model
+
+    def symbol(self, name: str) -> bool:
+        if type(self.model) is int:
+            return bool(self.model >> symbol_table.id(name) & 1)
+        return bool(self.model[name])
+
+    def negation(self, value: bool) -> bool:
+        return not value
+
+    def conjunction(self, values: list) -> bool:
+        return all(values)
+
+    def disjunction(self, values: list) -> bool:
+        return any(values)
+
+    def implication(self, antecedent: bool, consequent: bool) -> bool:
+        return not antecedent or consequent
+
+    def biconditional(self, left: bool, right: bool) -> bool:
+        return left == right
+
+    def cardinality(self, values: list, low: int, high: int) -> bool:
+        return low <= sum(values) <= high
+
+
+symbol_table = SymbolTable()
+
+# Structurally identical subformulas share one node, see Sentence.__post_init__
+interned = weakref.WeakValueDictionary()
+
+
+def rebuild(nodes: list) -> Sentence:
+    built = []
+    for cls, arguments in nodes:
+        values = []
+        for kind, value in arguments:
+            if kind == "operand":
+                value = built[value]
+            elif kind == "operands":
+                value = [built[i] for i in value]
+            values.append(value)
+        built.append(cls(*values))
+    return built[-1]
+
+
+def intern(sentence: Sentence) -> Sentence:
+    # Both the sentence and the node it is interned as are marked shared,
+    # so neither changes under the sentences built on them
+    if sentence._interned:
+        return sentence
+    object.__setattr__(sentence, "_shared", True)
+    shared = interned.setdefault(sentence.structure(), sentence)
+    object.__setattr__(shared, "_shared", True)
+    object.__setattr__(shared, "_interned", True)
+    return shared
+
+
+def create_model(symbols):
+    # Models are bitmasks over symbol ids, see symbol_table.decode for dicts
+    return symbol_table.models(symbols)
 
 
 def evaluate_query(knowledge, query, model):
@@ -164,22 +573,92 @@ def evaluate_query(knowledge, query, model):
     return True
 
 
-def model_check(knowledge: Sentence, query: Sentence):
-    symbols = set.union(knowledge.symbols(), query.symbols())
-    model = create_model(symbols)
+def model_check(
+    knowledge: Sentence,
+    query: Sentence,
+    engine: str = "enumerate",
+    simplify: bool = False,
+    cache: EntailmentCache | None = None,
+):
+    if cache is not None:
+        return cache.entails(
+            knowledge,
+            query,
+            lambda knowledge, query: model_check(knowledge, query, engine, simplify),
+        )
+
+    if simplify:
+        reduced = preprocess.residual(knowledge, query)
+        if isinstance(reduced, bool):
+            return reduced
+        knowledge, query = reduced
+
+    if engine == "cdcl":
+        return sat.entails(knowledge, query)
+    if engine == "bits":
+        # numpy is only needed by this engine
+        import truth_table
+
+        return truth_table.entails(knowledge, query)
+    if engine == "compiled":
+        return codegen.entails(knowledge, query)
+    if engine == "bdd":
+        return bdd.entails(knowledge, query)
+    if engine != "enumerate":
+        raise ValueError(f"unknown model checking engine {engine}")
 
-    return evaluate_query(knowledge, query, model)
+    symbols = set.union(knowledge.symbols(), query.symbols())
+    return evaluate_query(knowledge, query, create_model(symbols))
+
+
+def evaluate_symbols(knowledge: Sentence) -> dict[str, str]:
+    # Symbols fixed by unit facts are decided without enumerating them
+    residual, decided = preprocess.propagate(knowledge)
+    symbols = sorted(residual.symbols()) if isinstance(residual, Sentence) else []
+    everything = (1 << len(symbols)) - 1
+    consistent = residual is True
+    seen_true = 0
+    seen_false = 0
+
+    # Assignment numbers double as bitmasks of the symbols that are true
+    if isinstance(residual, Sentence):
+        evaluate = residual.compile(symbols, bitmask=True)
+        for assignment in range(1 << len(symbols)):
+            if evaluate(assignment):
+                consistent = True
+                seen_true |= assignment
+                seen_false |= everything & ~assignment
+                if seen_true & seen_false == everything:
+                    break
+
+    position = {symbol: i for i, symbol in enumerate(symbols)}
+    report = {}
+    for symbol in sorted(knowledge.symbols()):
+        if not consistent:
+            report[symbol] = "YES"
+        elif symbol in decided:
+            report[symbol] = "YES" if decided[symbol] else "NO"
+        elif symbol not in position:
+            report[symbol] = "Maybe"
+        elif not seen_false >> position[symbol] & 1:
+            report[symbol] = "YES"
+        elif not seen_true >> position[symbol] & 1:
+            report[symbol] = "NO"
+        else:
+            report[symbol] = "Maybe"
+    return report
 
 
-def check_knowledge(knowledge: Sentence):
-    symbols = knowledge.symbols()
-    model = create_model(symbols)
+def check_knowledge(knowledge: Sentence, quiet: bool = False) -> dict[str, str]:
+    report = evaluate_symbols(knowledge)
+    if quiet:
+        return report
 
-    for symbol in symbols:
-        symbol = Symbol(symbol)
-        if evaluate_query(knowledge, symbol, model):
-            cprint(f"{symbol.formula()}: YES", "green")
-        elif evaluate_query(knowledge, Not(symbol), model):
-            cprint(f"{symbol.formula()}: NO", "red")
+    for symbol, answer in report.items():
+        if answer == "YES":
+            cprint(f"{symbol}: YES", "green")
+        elif answer == "NO":
+            cprint(f"{symbol}: NO", "red")
         else:
-            print(f"{symbol.formula()}: Maybe")
+            print(f"{symbol}: Maybe")
+    return report
@@ -0,0 +1,136 @@
+"""
+Memoized entailment results.
+
+Results are keyed by structural fingerprints of the knowledge base and the
+query: digests built bottom-up from each node's connective and its
+operands' digests. Unlike `hash`, they are stable across processes, so
+results can be saved to a file and reused by later runs. Conjunctions,
+disjunctions and biconditionals are fingerprinted without regard to the
+order of their operands.
+"""
+
+import atexit
+import hashlib
+import json
+import os
+from collections import OrderedDict, namedtuple
+
+CacheInfo = namedtuple("CacheInfo", ["hits", "misses", "maxsize", "currsize"])
+
+
+def digest(*parts):
+    hasher = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        if isinstance(part, str):
+            part = part.encode()
+        hasher.update(len(part).to_bytes(4, "little"))
+        hasher.update(part)
+    return hasher.digest()
+
+
+class Fingerprint:
+    """
+    Implements the algebra used by `Sentence.fold`, where every
+    subsentence is interpreted as the digest of its structure.
+    """
+
+    def symbol(self, name):
+        return digest("symbol", name)
+
+    def negation(self, value):
+        return digest("not", value)
+
+    def conjunction(self, values):
+        return digest("and", *sorted(values))
+
+    def disjunction(self, values):
+        return digest("or", *sorted(values))
+
+    def implication(self, antecedent, consequent):
+        return digest("implies", antecedent, consequent)
+
+    def biconditional(self, left, right):
+        return digest("iff", *sorted((left, right)))
+
+    def cardinality(self, values, low, high):
+        bounds = f"{low},{min(high, len(values))}"
+        return digest("cardinality", bounds, *sorted(values))
+
+
+def fingerprint(sentence):
+    """Returns the structural fingerprint of sentence as a hex string."""
+    return sentence.fold(Fingerprint()).hex()
+
+
+class EntailmentCache:
+    """
+    Least recently used cache of entailment results, holding at most
+    maxsize of them. If path is given, results are loaded from that file
+    and saved back to it at exit.
+    """
+
+    def __init__(self, maxsize=4096, path=None):
+        self.maxsize = maxsize
+        self.path = path
+        self.results = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        if path is not None:
+            self.load()
+            atexit.register(self.save)
+
+    def key(self, knowledge, query):
+        return f"{fingerprint(knowledge)}:{fingerprint(query)}"
+
+    def get(self, key):
+        """Returns the result for key, or None if not cached."""
+        result = self.results.get(key)
+        if result is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.results.move_to_end(key)
+        return result
+
+    def put(self, key, result):
+        self.results[key] = result
+        self.results.move_to_end(key)
+        while len(self.results) > self.maxsize:
+            self.results.popitem(last=False)
+
+    def entails(self, knowledge, query, check):
+        """
+        Returns whether knowledge entails query, calling check(knowledge,
+        query) only if the result is not cached yet.
+        """
+        key = self.key(knowledge, query)
+        result = self.get(key)
+        if result is None:
+            result = check(knowledge, query)
+            self.put(key, result)
+        return result
+
+    def cache_info(self):
+        return CacheInfo(self.hits, self.misses, self.maxsize, len(self.results))
+
+    def clear(self):
+        self.results.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def load(self):
+        """Reads the results saved at path, if there are any."""
+        try:
+            with open(self.path) as file:
+                entries = json.load(file)
+        except FileNotFoundError:
+            return
+        for key, result in entries:
+            self.put(key, result)
+
+    def save(self):
+        """Writes the results to path, least recently used first."""
+        temporary = f"{self.path}.tmp"
+        with open(temporary, "w") as file:
+            json.dump(list(self.results.items()), file)
+        os.replace(temporary, self.path)
@@ -0,0 +1,105 @@
+"""
+Compiles sentences into plain Python functions.
+
+A sentence is rendered as a single Python expression over the values of
+its symbols, read either positionally from a tuple or as the bits of an
+integer. The generated function evaluates the sentence without per-node
+method dispatch or dict lookups. Deep or large subexpressions are hoisted
+into local variables so the source stays within the parser's limits and
+shared subsentences are not duplicated.
+"""
+
+MAX_DEPTH = 50
+MAX_LENGTH = 1000
+
+
+class Generator:
+    """
+    Implements the algebra used by `Sentence.fold`, where every
+    subsentence is interpreted as an (expression, depth) pair.
+    """
+
+    def __init__(self, symbols, bitmask=False):
+        self.index = {name: i for i, name in enumerate(symbols)}
+        self.bitmask = bitmask
+        self.lines = []
+
+    def hoist(self, expression, depth):
+        """Moves expression into a local variable once it gets too big."""
+        if depth < MAX_DEPTH and len(expression) < MAX_LENGTH:
+            return expression, depth
+        name = f"t{len(self.lines)}"
+        self.lines.append(f"{name} = {expression}")
+        return name, 0
+
+    def symbol(self, name):
+        if self.bitmask:
+            return f"(m >> {self.index[name]} & 1)", 0
+        return f"v[{self.index[name]}]", 0
+
+    def negation(self, value):
+        expression, depth = value
+        return self.hoist(f"(not {expression})", depth + 1)
+
+    def connective(self, operator, values, empty):
+        if not values:
+            return empty, 0
+        expression = f" {operator} ".join(expression for expression, _ in values)
+        return self.hoist(f"({expression})", 1 + max(depth for _, depth in values))
+
+    def conjunction(self, values):
+        return self.connective("and", values, "True")
+
+    def disjunction(self, values):
+        return self.connective("or", values, "False")
+
+    def implication(self, antecedent, consequent):
+        return self.disjunction([self.negation(antecedent), consequent])
+
+    def biconditional(self, left, right):
+        return self.connective("==", [self.truth(left), self.truth(right)], "True")
+
+    def cardinality(self, values, low, high):
+        if not values:
+            return str(low <= 0), 0
+        if not self.bitmask:
+            values = [self.truth(value) for value in values]
+        count = " + ".join(expression for expression, _ in values)
+        depth = 1 + max(depth for _, depth in values)
+        if high >= len(values):
+            return self.hoist(f"({count} >= {low})", depth)
+        return self.hoist(f"({low} <= {count} <= {high})", depth)
+
+    def truth(self, value):
+        expression, depth = value
+        return f"bool({expression})", depth + 1
+
+
+def compile_sentence(sentence, symbols, bitmask=False):
+    """
+    Returns a function evaluating sentence. It takes a tuple of the values
+    of symbols or, if bitmask is set, an integer whose bit i is the value
+    of symbols[i].
+    """
+    generator = Generator(symbols, bitmask)
+    expression, _ = sentence.fold(generator)
+    argument = "m" if bitmask else "v"
+    source = "\n".join(
+        [f"def evaluate({argument}):"]
+        + [f"    {line}" for line in generator.lines]
+        + [f"    return bool({expression})"]
+    )
+    namespace = {}
+    exec(compile(source, "<sentence>", "exec"), namespace)
+    return namespace["evaluate"]
+
+
+def entails(knowledge, query):
+    """Checks if knowledge entails query, evaluating compiled functions."""
+    symbols = sorted(set.union(knowledge.symbols(), query.symbols()))
+    knowledge = knowledge.compile(symbols, bitmask=True)
+    query = query.compile(symbols, bitmask=True)
+    for assignment in range(1 << len(symbols)):
+        if knowledge(assignment) and not query(assignment):
+            return False
+    return True
@@ -1,24 +1,241 @@
 import itertools
+import weakref
+
+import bdd
+import codegen
+import parallel
+import preprocess
+import sat
+from bdd import BDD
+from cache import EntailmentCache
+from sat import KnowledgeBase
+from symbol_table import SymbolTable
+
+# Sentences nested deeper than this are evaluated with an explicit stack
+MAX_RECURSION_DEPTH = 200
 
 
 class Sentence:
     def evaluate(self, model):
         """Evaluates the logical sentence."""
+        if self._depth > MAX_RECURSION_DEPTH:
+            return self.fold(Evaluation(model))
+        return self.holds(model)
+
+    def holds(self, model):
+        """Evaluates the logical sentence recursively."""
         raise Exception("nothing to evaluate")
 
     def formula(self):
         """Returns string formula representing logical sentence."""
-        return ""
+        pieces = []
+        stack = [self]
+        while stack:
+            item = stack.pop()
+            if isinstance(item, str):
+                pieces.append(item)
+            else:
+                stack.extend(reversed(item.layout()))
+        return "".join(pieces)
+
+    def layout(self):
+        """
+        Returns the formula as a list of strings and operands, each
+        operand standing for its own formula.
+        """
+        return []
+
+    def needs_parentheses(self):
+        """
+        Checks if the formula must be parenthesized as an operand, or
+        returns None if it is written as its only operand is.
+        """
+        return True
 
     def symbols(self):
         """Returns a set of all symbols in the logical sentence."""
-        return set()
+        if self._symbols is None:
+            self._symbols = self.collect_symbols()
+        return set(self._symbols)
+
+    def collect_symbols(self):
+        """
+        Gathers the symbols below the sentence in one pass, visiting
+        shared subsentences once. Only the sentence asked caches them, so
+        nodes do not each hold a copy of the symbols of everything below.
+        """
+        names = set()
+        visited = set()
+        stack = [self]
+        while stack:
+            sentence = stack.pop()
+            if id(sentence) in visited:
+                continue
+            visited.add(id(sentence))
+            if sentence._symbols is not None:
+                names.update(sentence._symbols)
+            else:
+                stack.extend(sentence.operands())
+        return names
+
+    def size(self):
+        """Returns the number of nodes in the sentence, counted as a tree."""
+        return self._size
+
+    def structure(self):
+        """
+        Returns a key that identifies the sentence given its operands.
+        Operands are interned, so equal sentences have the same key.
+        """
+        return (type(self),) + tuple(id(operand) for operand in self.operands())
+
+    def build(self):
+        """Caches the hash and size of a newly built sentence."""
+        size = depth = 0
+        for operand in self.operands():
+            size += operand._size
+            if operand._depth > depth:
+                depth = operand._depth
+        self._shared = False
+        self._interned = False
+        self._symbols = None
+        self._size = 1 + size
+        self._depth = 1 + depth
+        self._compiled = None
+        self._hash = None
+        hash(self)
+
+    def extend(self, operands, operand):
+        """
+        Appends operand to a list of operands of this sentence, and
+        returns the sentence. A sentence that has been used as an operand
+        is left as it is, and a new one with operand appended is returned.
+        """
+        if self._shared:
+            return type(self)(*self.parameters(), *operands, operand)
+        operand = intern(operand)
+        operands.append(operand)
+        if self._symbols is not None:
+            self._symbols.update(operand.collect_symbols())
+        self._size += operand._size
+        self._depth = max(self._depth, operand._depth + 1)
+        self._compiled = None
+        self._hash = None
+        return self
+
+    def __reduce__(self):
+        """
+        Pickles the sentence as a flat list of its nodes, operands first,
+        so deep sentences do not exceed the recursion limit. Each node is
+        (class, parameters, indices of its operands in the list).
+        """
+        nodes = []
+        index = {}
+        stack = [self]
+        while stack:
+            sentence = stack[-1]
+            if id(sentence) in index:
+                stack.pop()
+                continue
+            pending = [
+                operand for operand in sentence.operands() if id(operand) not in index
+            ]
+            if pending:
+                stack.extend(pending)
+            else:
+                stack.pop()
+                index[id(sentence)] = len(nodes)
+                nodes.append(
+                    (
+                        type(sentence),
+                        sentence.parameters(),
+                        tuple(index[id(operand)] for operand in sentence.operands()),
+                    )
+                )
+        return (rebuild, (nodes,))
+
+    def parameters(self):
+        """Returns the constructor arguments that come before operands."""
+        return ()
+
+    def compile(self, symbols=None, bitmask=False):
+        """
+        Returns a generated Python function that evaluates the sentence,
+        given a tuple of the values of symbols (sorted symbol names by
+        default) or, with bitmask, an integer whose bit i holds symbols[i].
+        """
+        symbols = tuple(sorted(self.symbols()) if symbols is None else symbols)
+        if self._compiled is None:
+            self._compiled = {}
+        if (symbols, bitmask) not in self._compiled:
+            self._compiled[symbols, bitmask] = codegen.compile_sentence(
+                self, symbols, bitmask
+            )
+        return self._compiled[symbols, bitmask]
+
+    def operands(self):
+        """Returns the immediate subsentences of the logical sentence."""
+        return ()
+
+    def combine(self, algebra, values):
+        """Interprets the sentence in algebra, given its operands' values."""
+        raise Exception("nothing to combine")
+
+    def builder(self):
+        """Returns the algebra that builds sentences of this kind."""
+        return builder
+
+    def fold(self, algebra):
+        """
+        Interprets the sentence bottom-up in algebra, which provides one
+        method per connective. Shared subsentences are interpreted once.
+        """
+        values = {}
+        stack = [self]
+        while stack:
+            sentence = stack[-1]
+            if id(sentence) in values:
+                stack.pop()
+                continue
+            pending = [
+                operand for operand in sentence.operands() if id(operand) not in values
+            ]
+            if pending:
+                stack.extend(pending)
+            else:
+                stack.pop()
+                values[id(sentence)] = sentence.combine(
+                    algebra, [values[id(operand)] for operand in sentence.operands()]
+                )
+        return values[id(self)]
 
     @classmethod
     def validate(cls, sentence):
         if not isinstance(sentence, Sentence):
             raise TypeError("must be a logical sentence")
 
+    @classmethod
+    def wrap(cls, sentence):
+        """Returns the layout of sentence as an operand."""
+        inner = sentence
+        needed = inner.needs_parentheses()
+        while needed is None:
+            inner = inner.operands()[0]
+            needed = inner.needs_parentheses()
+        if needed:
+            return ["(", sentence, ")"]
+        return [sentence]
+
+    @classmethod
+    def join(cls, separator, operands):
+        """Returns the layout of operands with separator between them."""
+        layout = []
+        for operand in operands:
+            if layout:
+                layout.append(separator)
+            layout.extend(Sentence.wrap(operand))
+        return layout
+
     @classmethod
     def parenthesize(cls, s):
         """Parenthesizes an expression if not already parenthesized."""
@@ -48,64 +265,91 @@ class Sentence:
 class Symbol(Sentence):
     def __init__(self, name):
         self.name = name
+        self.id = symbol_table.id(name)
+        self.build()
+        self._symbols = {name}
 
     def __eq__(self, other):
         return isinstance(other, Symbol) and self.name == other.name
 
     def __hash__(self):
-        return hash(("symbol", self.name))
+        if self._hash is None:
+            self._hash = hash(("symbol", self.name))
+        return self._hash
+
+    def structure(self):
+        return (Symbol, self.name)
+
+    def parameters(self):
+        return (self.name,)
 
     def __repr__(self):
         return self.name
 
-    def evaluate(self, model):
+    def holds(self, model):
+        if type(model) is int:
+            return bool(model >> self.id & 1)
         try:
             return bool(model[self.name])
         except KeyError:
             raise Exception(f"variable {self.name} not in model")
 
-    def formula(self):
-        return self.name
+    def layout(self):
+        return [self.name]
 
-    def symbols(self):
-        return {self.name}
+    def needs_parentheses(self):
+        return Sentence.parenthesize(self.name) != self.name
+
+    def combine(self, algebra, values):
+        return algebra.symbol(self.name)
 
 
 class Not(Sentence):
     def __init__(self, operand):
         Sentence.validate(operand)
-        self.operand = operand
+        self.operand = intern(operand)
+        self.build()
 
     def __eq__(self, other):
-        return isinstance(other, Not) and self.operand == other.operand
+        return isinstance(other, Not) and self.structure() == other.structure()
 
     def __hash__(self):
-        return hash(("not", hash(self.operand)))
+        if self._hash is None:
+            self._hash = hash(("not", hash(self.operand)))
+        return self._hash
 
     def __repr__(self):
         return f"Not({self.operand})"
 
-    def evaluate(self, model):
-        return not self.operand.evaluate(model)
+    def holds(self, model):
+        return not self.operand.holds(model)
 
-    def formula(self):
-        return "¬" + Sentence.parenthesize(self.operand.formula())
+    def layout(self):
+        return ["¬"] + Sentence.wrap(self.operand)
 
-    def symbols(self):
-        return self.operand.symbols()
+    def operands(self):
+        return (self.operand,)
+
+    def combine(self, algebra, values):
+        return algebra.negation(values[0])
 
 
 class And(Sentence):
     def __init__(self, *conjuncts):
         for conjunct in conjuncts:
             Sentence.validate(conjunct)
-        self.conjuncts = list(conjuncts)
+        self.conjuncts = [intern(conjunct) for conjunct in conjuncts]
+        self.build()
 
     def __eq__(self, other):
-        return isinstance(other, And) and self.conjuncts == other.conjuncts
+        return isinstance(other, And) and self.structure() == other.structure()
 
     def __hash__(self):
-        return hash(("and", tuple(hash(conjunct) for conjunct in self.conjuncts)))
+        if self._hash is None:
+            self._hash = hash(
+                ("and", tuple(hash(conjunct) for conjunct in self.conjuncts))
+            )
+        return self._hash
 
     def __repr__(self):
         conjunctions = ", ".join([str(conjunct) for conjunct in self.conjuncts])
@@ -113,123 +357,393 @@ class And(Sentence):
 
     def add(self, conjunct):
         Sentence.validate(conjunct)
-        self.conjuncts.append(conjunct)
+        return self.extend(self.conjuncts, conjunct)
 
-    def evaluate(self, model):
-        return all(conjunct.evaluate(model) for conjunct in self.conjuncts)
+    def holds(self, model):
+        return all(conjunct.holds(model) for conjunct in self.conjuncts)
 
-    def formula(self):
+    def layout(self):
         if len(self.conjuncts) == 1:
-            return self.conjuncts[0].formula()
-        return " ∧ ".join(
-            [Sentence.parenthesize(conjunct.formula()) for conjunct in self.conjuncts]
-        )
+            return [self.conjuncts[0]]
+        return Sentence.join(" ∧ ", self.conjuncts)
 
-    def symbols(self):
-        return set.union(*[conjunct.symbols() for conjunct in self.conjuncts])
+    def needs_parentheses(self):
+        if len(self.conjuncts) == 1:
+            return None
+        return len(self.conjuncts) > 1
+
+    def operands(self):
+        return tuple(self.conjuncts)
+
+    def combine(self, algebra, values):
+        return algebra.conjunction(values)
 
 
 class Or(Sentence):
     def __init__(self, *disjuncts):
         for disjunct in disjuncts:
             Sentence.validate(disjunct)
-        self.disjuncts = list(disjuncts)
+        self.disjuncts = [intern(disjunct) for disjunct in disjuncts]
+        self.build()
 
     def __eq__(self, other):
-        return isinstance(other, Or) and self.disjuncts == other.disjuncts
+        return isinstance(other, Or) and self.structure() == other.structure()
 
     def __hash__(self):
-        return hash(("or", tuple(hash(disjunct) for disjunct in self.disjuncts)))
+        if self._hash is None:
+            self._hash = hash(
+                ("or", tuple(hash(disjunct) for disjunct in self.disjuncts))
+            )
+        return self._hash
 
     def __repr__(self):
         disjuncts = ", ".join([str(disjunct) for disjunct in self.disjuncts])
         return f"Or({disjuncts})"
 
-    def evaluate(self, model):
-        return any(disjunct.evaluate(model) for disjunct in self.disjuncts)
+    def holds(self, model):
+        return any(disjunct.holds(model) for disjunct in self.disjuncts)
 
-    def formula(self):
+    def layout(self):
         if len(self.disjuncts) == 1:
-            return self.disjuncts[0].formula()
-        return " ∨  ".join(
-            [Sentence.parenthesize(disjunct.formula()) for disjunct in self.disjuncts]
-        )
+            return [self.disjuncts[0]]
+        return Sentence.join(" ∨  ", self.disjuncts)
 
-    def symbols(self):
-        return set.union(*[disjunct.symbols() for disjunct in self.disjuncts])
+    def needs_parentheses(self):
+        if len(self.disjuncts) == 1:
+            return None
+        return len(self.disjuncts) > 1
+
+    def operands(self):
+        return tuple(self.disjuncts)
+
+    def combine(self, algebra, values):
+        return algebra.disjunction(values)
 
 
 class Implication(Sentence):
     def __init__(self, antecedent, consequent):
         Sentence.validate(antecedent)
         Sentence.validate(consequent)
-        self.antecedent = antecedent
-        self.consequent = consequent
+        self.antecedent = intern(antecedent)
+        self.consequent = intern(consequent)
+        self.build()
 
     def __eq__(self, other):
-        return (
-            isinstance(other, Implication)
-            and self.antecedent == other.antecedent
-            and self.consequent == other.consequent
-        )
+        return isinstance(other, Implication) and self.structure() == other.structure()
 
     def __hash__(self):
-        return hash(("implies", hash(self.antecedent), hash(self.consequent)))
+        if self._hash is None:
+            self._hash = hash(("implies", hash(self.antecedent), hash(self.consequent)))
+        return self._hash
 
     def __repr__(self):
         return f"Implication({self.antecedent}, {self.consequent})"
 
-    def evaluate(self, model):
-        return (not self.antecedent.evaluate(model)) or self.consequent.evaluate(model)
+    def holds(self, model):
+        return (not self.antecedent.holds(model)) or self.consequent.holds(model)
 
-    def formula(self):
-        antecedent = Sentence.parenthesize(self.antecedent.formula())
-        consequent = Sentence.parenthesize(self.consequent.formula())
-        return f"{antecedent} => {consequent}"
+    def layout(self):
+        return (
+            Sentence.wrap(self.antecedent) + [" => "] + Sentence.wrap(self.consequent)
+        )
 
-    def symbols(self):
-        return set.union(self.antecedent.symbols(), self.consequent.symbols())
+    def operands(self):
+        return (self.antecedent, self.consequent)
+
+    def combine(self, algebra, values):
+        return algebra.implication(*values)
 
 
 class Biconditional(Sentence):
     def __init__(self, left, right):
         Sentence.validate(left)
         Sentence.validate(right)
-        self.left = left
-        self.right = right
+        self.left = intern(left)
+        self.right = intern(right)
+        self.build()
 
     def __eq__(self, other):
         return (
-            isinstance(other, Biconditional)
-            and self.left == other.left
-            and self.right == other.right
+            isinstance(other, Biconditional) and self.structure() == other.structure()
         )
 
     def __hash__(self):
-        return hash(("biconditional", hash(self.left), hash(self.right)))
+        if self._hash is None:
+            self._hash = hash(("biconditional", hash(self.left), hash(self.right)))
+        return self._hash
 
     def __repr__(self):
         return f"Biconditional({self.left}, {self.right})"
 
-    def evaluate(self, model):
-        return (self.left.evaluate(model) and self.right.evaluate(model)) or (
-            not self.left.evaluate(model) and not self.right.evaluate(model)
+    def holds(self, model):
+        return (self.left.holds(model) and self.right.holds(model)) or (
+            not self.left.holds(model) and not self.right.holds(model)
         )
 
-    def formula(self):
-        left = Sentence.parenthesize(str(self.left))
-        right = Sentence.parenthesize(str(self.right))
-        return f"{left} <=> {right}"
+    def layout(self):
+        return Sentence.wrap(self.left) + [" <=> "] + Sentence.wrap(self.right)
 
-    def symbols(self):
-        return set.union(self.left.symbols(), self.right.symbols())
+    def operands(self):
+        return (self.left, self.right)
+
+    def combine(self, algebra, values):
+        return algebra.biconditional(*values)
+
+
+class Cardinality(Sentence):
+    """
+    Base class of sentences that bound how many of their terms are true.
+    bounds() gives the inclusive (low, high) range for the count.
+    """
+
+    def __init__(self, *terms):
+        for term in terms:
+            Sentence.validate(term)
+        self.terms = [intern(term) for term in terms]
+        self.build()
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self.structure() == other.structure()
+
+    def __hash__(self):
+        if self._hash is None:
+            self._hash = hash(
+                (
+                    type(self).__name__,
+                    self.bounds(),
+                    tuple(hash(term) for term in self.terms),
+                )
+            )
+        return self._hash
+
+    def structure(self):
+        return (type(self), self.bounds()) + tuple(id(term) for term in self.terms)
+
+    def bounds(self):
+        raise Exception("no bounds")
+
+    def add(self, term):
+        Sentence.validate(term)
+        return self.extend(self.terms, term)
+
+    def holds(self, model):
+        low, high = self.bounds()
+        count = 0
+        for term in self.terms:
+            if term.holds(model):
+                count += 1
+                if count > high:
+                    return False
+        return count >= low
+
+    def layout(self):
+        layout = [f"{self.name()}("]
+        for term in self.terms:
+            if len(layout) > 1:
+                layout.append(", ")
+            layout.append(term)
+        return layout + [")"]
+
+    def name(self):
+        return type(self).__name__
 
+    def operands(self):
+        return tuple(self.terms)
 
-def model_check(knowledge, query):
-    """Checks if knowledge base entails query."""
+    def combine(self, algebra, values):
+        low, high = self.bounds()
+        return algebra.cardinality(values, low, high)
+
+
+class ExactlyOne(Cardinality):
+    def __repr__(self):
+        terms = ", ".join([str(term) for term in self.terms])
+        return f"ExactlyOne({terms})"
+
+    def bounds(self):
+        return (1, 1)
+
+
+class AtMostK(Cardinality):
+    def __init__(self, k, *terms):
+        self.k = k
+        super().__init__(*terms)
+
+    def parameters(self):
+        return (self.k,)
+
+    def __repr__(self):
+        terms = ", ".join([str(term) for term in self.terms])
+        return f"AtMostK({self.k}, {terms})"
+
+    def name(self):
+        return f"AtMost{self.k}"
+
+    def bounds(self):
+        return (0, self.k)
+
+
+class AtLeastK(Cardinality):
+    def __init__(self, k, *terms):
+        self.k = k
+        super().__init__(*terms)
+
+    def parameters(self):
+        return (self.k,)
+
+    def __repr__(self):
+        terms = ", ".join([str(term) for term in self.terms])
+        return f"AtLeastK({self.k}, {terms})"
+
+    def name(self):
+        return f"AtLeast{self.k}"
+
+    def bounds(self):
+        return (self.k, len(self.terms))
+
+
+class Builder:
+    """Algebra that builds sentences, used to construct transformed ones."""
+
+    def symbol(self, name):
+        return Symbol(name)
+
+    def negation(self, operand):
+        return Not(operand)
+
+    def conjunction(self, operands):
+        return And(*operands)
+
+    def disjunction(self, operands):
+        return Or(*operands)
+
+    def implication(self, antecedent, consequent):
+        return Implication(antecedent, consequent)
+
+    def biconditional(self, left, right):
+        return Biconditional(left, right)
+
+    def cardinality(self, operands, low, high):
+        if low == high == 1:
+            return ExactlyOne(*operands)
+        if low <= 0:
+            return AtMostK(high, *operands)
+        if high >= len(operands):
+            return AtLeastK(low, *operands)
+        return And(AtLeastK(low, *operands), AtMostK(high, *operands))
+
+
+builder = Builder()
+
+
+class Evaluation:
+    """Algebra that evaluates sentences in model, a dict or a bitmask."""
+
+    def __init__(self, model):
+        self.model = model
+
+    def symbol(self, name):
+        if type(self.model) is int:
+            return bool(self.model >> symbol_table.id(name) & 1)
+        try:
+            return bool(self.model[name])
+        except KeyError:
+            raise Exception(f"variable {name} not in model")
+
+    def negation(self, value):
+        return not value
+
+    def conjunction(self, values):
+        return all(values)
+
+    def disjunction(self, values):
+        return any(values)
+
+    def implication(self, antecedent, consequent):
+        return not antecedent or consequent
+
+    def biconditional(self, left, right):
+        return left == right
+
+    def cardinality(self, values, low, high):
+        return low <= sum(values) <= high
+
+
+# Every symbol has a dense id, its bit in models given as integers
+symbol_table = SymbolTable()
+
+# Structurally identical subsentences share one node, see intern()
+interned = weakref.WeakValueDictionary()
+
+
+def rebuild(nodes):
+    """Builds the sentence pickled as nodes, see Sentence.__reduce__."""
+    built = []
+    for cls, parameters, operands in nodes:
+        built.append(cls(*parameters, *[built[i] for i in operands]))
+    return built[-1]
+
+
+def intern(sentence):
+    """
+    Returns the shared sentence structurally identical to sentence. Both
+    are marked as shared, so adding to either leaves it as it is, and
+    the sentences built on them never see it change.
+    """
+    if sentence._interned:
+        return sentence
+    sentence._shared = True
+    shared = interned.setdefault(sentence.structure(), sentence)
+    shared._shared = True
+    shared._interned = True
+    return shared
+
+
+def model_check(knowledge, query, engine="enumerate", simplify=False, cache=None):
+    """
+    Checks if knowledge base entails query.
+
+    engine selects how: "enumerate" checks every truth assignment,
+    "compiled" does the same with sentences compiled to Python functions,
+    "parallel" splits that work over a pool of processes, "bdd" compiles
+    both into binary decision diagrams, and "cdcl" refutes
+    knowledge ∧ ¬query with the clause-learning solver.
+
+    With simplify, unit facts and pure literals are decided first and only
+    the residual knowledge and query are passed on to the engine.
+
+    With cache, an EntailmentCache, the result is looked up by the
+    structure of knowledge and query and only computed if not found.
+    """
+
+    if cache is not None:
+        def check(knowledge, query):
+            return model_check(knowledge, query, engine, simplify)
+
+        return cache.entails(knowledge, query, check)
+
+    if simplify:
+        reduced = preprocess.residual(knowledge, query)
+        if isinstance(reduced, bool):
+            return reduced
+        knowledge, query = reduced
+
+    if engine == "cdcl":
+        return sat.entails(knowledge, query)
+    if engine == "compiled":
+        return codegen.entails(knowledge, query)
+    if engine == "parallel":
+        return parallel.entails(knowledge, query)
+    if engine == "bdd":
+        return bdd.entails(knowledge, query)
+    if engine != "enumerate":
+        raise ValueError(f"unknown model checking engine {engine}")
 
     def check_all(knowledge, query, symbols, model):
-        """Checks if knowledge base entails query, given a particular model."""
+        """
+        Checks if knowledge base entails query, given a particular model.
+        symbols holds the bits of the symbols not yet in the model.
+        """
 
         # If model has an assignment for each symbol
         if not symbols:
@@ -239,24 +753,20 @@ def model_check(knowledge, query):
             return True
         else:
             # Choose one of the remaining unused symbols
-            remaining = symbols.copy()
-            p = remaining.pop()
+            bit = symbols.pop()
 
-            # Create a model where the symbol is true
-            model_true = model.copy()
-            model_true[p] = True
-
-            # Create a model where the symbol is false
-            model_false = model.copy()
-            model_false[p] = False
-
-            # Ensure entailment holds in both models
-            return check_all(knowledge, query, remaining, model_true) and check_all(
-                knowledge, query, remaining, model_false
+            # Ensure entailment holds with the symbol both true and false
+            entailed = check_all(knowledge, query, symbols, model | bit) and check_all(
+                knowledge, query, symbols, model
             )
 
-    # Get all symbols in both knowledge and query
+            # Put the symbol back for the caller's other branch
+            symbols.append(bit)
+            return entailed
+
+    # Get the bits of all symbols in both knowledge and query
     symbols = set.union(knowledge.symbols(), query.symbols())
+    bits = [symbol_table.bit(name) for name in sorted(symbols)]
 
-    # Check that knowledge entails query
-    return check_all(knowledge, query, symbols, dict())
+    # Check that knowledge entails query, starting from all symbols false
+    return check_all(knowledge, query, bits, 0)
@@ -0,0 +1,73 @@
+"""
+Parallel model checking over a process pool.
+
+The truth assignments are split by the values of the first few symbols.
+Each worker receives the knowledge base and query once, compiles them, and
+then checks whole subtrees of assignments, one prefix per task. As soon as
+any worker finds a counter-model the others are told to stop and the
+remaining tasks are cancelled.
+"""
+
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from multiprocessing import Event
+
+# How often (in assignments) a worker checks whether it should stop
+STOP_INTERVAL = 1 << 12
+
+# Per-process state set up by start_worker
+worker = {}
+
+
+def start_worker(knowledge, query, symbols, prefix_bits, stop):
+    worker["knowledge"] = knowledge.compile(symbols, bitmask=True)
+    worker["query"] = query.compile(symbols, bitmask=True)
+    worker["rest_bits"] = len(symbols) - prefix_bits
+    worker["prefix_bits"] = prefix_bits
+    worker["stop"] = stop
+
+
+def check_prefix(prefix):
+    """Checks every assignment whose first symbols are given by prefix."""
+    knowledge = worker["knowledge"]
+    query = worker["query"]
+    prefix_bits = worker["prefix_bits"]
+    stop = worker["stop"]
+    for rest in range(1 << worker["rest_bits"]):
+        if rest % STOP_INTERVAL == 0 and stop.is_set():
+            return True
+        assignment = prefix | rest << prefix_bits
+        if knowledge(assignment) and not query(assignment):
+            stop.set()
+            return False
+    return True
+
+
+def entails(knowledge, query, workers=None, prefix_bits=None):
+    """
+    Checks if knowledge entails query with a pool of worker processes,
+    one per CPU unless workers is given. The assignments are split on the
+    first prefix_bits symbols, by default enough for a few tasks per worker.
+    """
+    symbols = sorted(set.union(knowledge.symbols(), query.symbols()))
+    workers = workers or os.cpu_count() or 1
+    if prefix_bits is None:
+        prefix_bits = (4 * workers - 1).bit_length()
+    prefix_bits = min(prefix_bits, len(symbols))
+
+    stop = Event()
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=start_worker,
+        initargs=(knowledge, query, symbols, prefix_bits, stop),
+    ) as executor:
+        pending = {
+            executor.submit(check_prefix, prefix) for prefix in range(1 << prefix_bits)
+        }
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            if not all(future.result() for future in done):
+                stop.set()
+                executor.shutdown(cancel_futures=True)
+                return False
+    return True
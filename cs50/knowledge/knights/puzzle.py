@@ -79,8 +79,10 @@ def main():
         if len(knowledge.conjuncts) == 0:
             print("    Not yet implemented.")
         else:
+            # Compile the puzzle once, then ask about every symbol
+            diagram = BDD(knowledge)
             for symbol in symbols:
-                if model_check(knowledge, symbol):
+                if diagram.entails(symbol):
                     print(f"    {symbol}")
 
 
@@ -0,0 +1,102 @@
+"""
+Bit-parallel truth tables for the logic modules.
+
+Every symbol becomes a column of bits, one per truth assignment, packed
+into 64-bit words. Connectives are then bitwise operations over whole
+columns, so a sentence is evaluated in all assignments at once. Bit k of
+assignment number a holds the value of the k-th symbol in sorted order,
+and large tables are processed in chunks so memory stays bounded.
+"""
+
+from functools import reduce
+
+import numpy as np
+
+from sat import sequential_counter
+
+WORD_BITS = 6
+ALL = np.uint64(0xFFFFFFFFFFFFFFFF)
+NONE = np.uint64(0)
+
+# Within a word, symbol i (for i < 6) is true at bit k when (k >> i) & 1
+PATTERNS = [
+    np.uint64(sum(1 << k for k in range(64) if (k >> i) & 1)) for i in range(WORD_BITS)
+]
+
+
+class TruthTable:
+    """
+    A chunk of 2**chunk_bits consecutive assignments of symbols, starting
+    at assignment number start.
+
+    Implements the algebra used by `Sentence.fold`: symbols whose value is
+    fixed within the chunk are scalar words, the others are word arrays.
+    """
+
+    def __init__(self, symbols, start=0, chunk_bits=None):
+        self.symbols = sorted(symbols)
+        if chunk_bits is None:
+            chunk_bits = len(self.symbols)
+        self.start = start
+        self.chunk_bits = chunk_bits
+        self.words = 1 << max(0, chunk_bits - WORD_BITS)
+        self.index = {name: i for i, name in enumerate(self.symbols)}
+
+        # Only the low 2**chunk_bits bits of a single word are real assignments
+        if chunk_bits < WORD_BITS:
+            self.mask = np.uint64((1 << (1 << chunk_bits)) - 1)
+        else:
+            self.mask = ALL
+
+    def column(self, i):
+        """Returns the bits of the i-th symbol over this chunk."""
+        if i >= self.chunk_bits:
+            return ALL if (self.start >> i) & 1 else NONE
+        if i < WORD_BITS:
+            return np.full(self.words, PATTERNS[i], dtype=np.uint64)
+        bits = (
+            np.arange(self.words, dtype=np.uint64) >> np.uint64(i - WORD_BITS)
+        ) & np.uint64(1)
+        return bits * ALL
+
+    def evaluate(self, sentence):
+        """Returns the masked bits of sentence over this chunk."""
+        return sentence.fold(self) & self.mask
+
+    def symbol(self, name):
+        return self.column(self.index[name])
+
+    def negation(self, value):
+        return ~value
+
+    def conjunction(self, values):
+        return reduce(np.bitwise_and, values, ALL)
+
+    def disjunction(self, values):
+        return reduce(np.bitwise_or, values, NONE)
+
+    def implication(self, antecedent, consequent):
+        return ~antecedent | consequent
+
+    def biconditional(self, left, right):
+        return ~(left ^ right)
+
+    def cardinality(self, values, low, high):
+        return sequential_counter(self, values, low, high)
+
+
+def truth_tables(symbols, chunk_bits=20):
+    """Yields the truth table of symbols as consecutive chunks."""
+    symbols = sorted(symbols)
+    chunk_bits = min(chunk_bits, len(symbols))
+    for chunk in range(1 << (len(symbols) - chunk_bits)):
+        yield TruthTable(symbols, chunk << chunk_bits, chunk_bits)
+
+
+def entails(knowledge, query, chunk_bits=20):
+    """Checks if knowledge entails query in every assignment of their symbols."""
+    symbols = set.union(knowledge.symbols(), query.symbols())
+    for table in truth_tables(symbols, chunk_bits):
+        if np.any(table.evaluate(knowledge) & ~table.evaluate(query) & table.mask):
+            return False
+    return True
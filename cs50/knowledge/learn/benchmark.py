@@ -0,0 +1,281 @@
+"""
+Benchmarks for the logic engines over generated puzzles of growing size.
+
+Each generator builds a knowledge base and a query with a builder algebra,
+so the same puzzle can be built for either logic module:
+
+- knights: n inhabitants, each a knight or a knave, each making one
+  random statement about another
+- pigeonhole: n + 1 pigeons in n holes, which has no models
+- houses: the persons × houses assignment of harry_hard.py, with a hidden
+  solution and a few hints about it
+
+Every case is run three times: once for the time, once under tracemalloc
+for the peak memory, and once counting evaluations (calls to evaluate and
+to compiled sentences), so the instrumentation does not skew the timing.
+Results are printed and written as JSON, so runs can be compared.
+
+    python benchmark.py --sizes 3,6,9 --output results.json
+"""
+
+import argparse
+import json
+import platform
+import random
+import time
+import tracemalloc
+
+import better_logic
+import codegen
+import logic
+import preprocess
+from bdd import NodeLimitError
+
+ENGINES = ["enumerate", "compiled", "cdcl", "bdd"]
+
+# Engines that try every assignment are skipped beyond this many symbols
+MAX_ENUMERATED_SYMBOLS = 20
+
+
+def knights(builder, n, seed=0):
+    rng = random.Random(seed)
+    knight = [builder.symbol(f"Knight{i}") for i in range(n)]
+    knave = [builder.symbol(f"Knave{i}") for i in range(n)]
+    sentences = []
+    for i in range(n):
+        sentences.append(builder.disjunction([knight[i], knave[i]]))
+        sentences.append(builder.negation(builder.conjunction([knight[i], knave[i]])))
+
+        # Inhabitant i talks about someone else, or about themself if alone
+        j = rng.choice([j for j in range(n) if j != i] or [i])
+        statement = rng.choice(
+            [
+                knight[j],
+                knave[j],
+                builder.biconditional(knight[i], knight[j]),
+                builder.conjunction([knave[i], knave[j]]),
+            ]
+        )
+        sentences.append(builder.implication(knight[i], statement))
+        sentences.append(builder.implication(knave[i], builder.negation(statement)))
+    return builder.conjunction(sentences), knight[0]
+
+
+def pigeonhole(builder, n, seed=0):
+    pigeons = range(n + 1)
+    holes = range(n)
+    inside = [[builder.symbol(f"Pigeon{i}Hole{j}") for j in holes] for i in pigeons]
+    sentences = [builder.disjunction(inside[i]) for i in pigeons]
+    for j in holes:
+        for i in pigeons:
+            for k in range(i + 1, n + 1):
+                sentences.append(
+                    builder.negation(builder.conjunction([inside[i][j], inside[k][j]]))
+                )
+    return builder.conjunction(sentences), inside[0][0]
+
+
+def houses(builder, n, seed=0):
+    rng = random.Random(seed)
+    solution = list(range(n))
+    rng.shuffle(solution)
+    sorted_into = [
+        [builder.symbol(f"Person{i}House{j}") for j in range(n)] for i in range(n)
+    ]
+    sentences = [builder.cardinality(sorted_into[i], 1, 1) for i in range(n)]
+    sentences += [
+        builder.cardinality([sorted_into[i][j] for i in range(n)], 0, 1)
+        for j in range(n)
+    ]
+
+    # Rule out two wrong houses for every person but the first
+    for i in range(1, n):
+        wrong = [j for j in range(n) if j != solution[i]]
+        for j in rng.sample(wrong, min(2, len(wrong))):
+            sentences.append(builder.negation(sorted_into[i][j]))
+    return builder.conjunction(sentences), sorted_into[0][solution[0]]
+
+
+GENERATORS = {
+    "knights": knights,
+    "pigeonhole": pigeonhole,
+    "houses": houses,
+}
+
+
+class Counter:
+    """
+    Counts calls to evaluate and to compiled sentences while used as a
+    context manager.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.patched = []
+
+    def patch(self, owner, name, wrapper):
+        self.patched.append((owner, name, getattr(owner, name)))
+        setattr(owner, name, wrapper(getattr(owner, name)))
+
+    def __enter__(self):
+        def count_calls(function):
+            def counted(*args):
+                self.count += 1
+                return function(*args)
+
+            return counted
+
+        def count_compiled(compile_sentence):
+            def compiled(*args):
+                return count_calls(compile_sentence(*args))
+
+            return compiled
+
+        for module in (logic, better_logic):
+            self.patch(module.Sentence, "evaluate", count_calls)
+        self.patch(codegen, "compile_sentence", count_compiled)
+        return self
+
+    def __exit__(self, *exc):
+        for owner, name, original in reversed(self.patched):
+            setattr(owner, name, original)
+
+
+# Each task builds its puzzle and returns the check to measure on it
+
+
+def model_check(generator, size, engine):
+    def setup():
+        knowledge, query = generator(logic.builder, size)
+        return lambda: logic.model_check(knowledge, query, engine)
+
+    return setup
+
+
+def check_knowledge(generator, size):
+    def setup():
+        knowledge, _ = generator(better_logic.builder, size)
+
+        def check():
+            report = better_logic.check_knowledge(knowledge, quiet=True)
+            return sum(answer != "Maybe" for answer in report.values())
+
+        return check
+
+    return setup
+
+
+def measure(setup, repeat):
+    """
+    Returns the result, best time, peak memory and evaluations of the
+    check made by setup. Every run gets a freshly built puzzle, so nothing
+    compiled for one run is reused by the next.
+    """
+    seconds = float("inf")
+    for _ in range(repeat):
+        check = setup()
+        start = time.perf_counter()
+        result = check()
+        seconds = min(seconds, time.perf_counter() - start)
+        del check
+
+    check = setup()
+    tracemalloc.start()
+    check()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del check
+
+    check = setup()
+    with Counter() as counter:
+        check()
+    return result, seconds, peak, counter.count
+
+
+def cases(generators, sizes, engines):
+    """Yields (case, setup) for every benchmark case, or (case, None) if skipped."""
+    for name in generators:
+        generator = GENERATORS[name]
+        for size in sizes:
+            knowledge, _ = generator(logic.builder, size)
+            symbols = len(knowledge.symbols())
+            description = {
+                "generator": name,
+                "size": size,
+                "symbols": symbols,
+                "nodes": knowledge.size(),
+            }
+            for engine in engines:
+                case = {**description, "task": "model_check", "engine": engine}
+                if engine in ("enumerate", "compiled"):
+                    if symbols > MAX_ENUMERATED_SYMBOLS:
+                        yield case, None
+                        continue
+                yield case, model_check(generator, size, engine)
+            # check_knowledge only enumerates what unit facts leave undecided
+            case = {**description, "task": "check_knowledge", "engine": "better_logic"}
+            residual, _ = preprocess.propagate(knowledge)
+            if not isinstance(residual, bool) and (
+                len(residual.symbols()) > MAX_ENUMERATED_SYMBOLS
+            ):
+                yield case, None
+            else:
+                yield case, check_knowledge(generator, size)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--generators", default=",".join(GENERATORS))
+    parser.add_argument("--sizes", default="3,5,7")
+    parser.add_argument("--engines", default=",".join(ENGINES))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", default="benchmark.json")
+    args = parser.parse_args()
+
+    generators = args.generators.split(",")
+    sizes = [int(size) for size in args.sizes.split(",")]
+    engines = args.engines.split(",")
+
+    results = []
+    for case, run in cases(generators, sizes, engines):
+        if run is None:
+            case["skipped"] = "too many symbols to enumerate"
+        else:
+            try:
+                result, seconds, peak, evaluations = measure(run, args.repeat)
+            except NodeLimitError as error:
+                case["skipped"] = str(error)
+            else:
+                case.update(
+                    result=result,
+                    seconds=seconds,
+                    peak_bytes=peak,
+                    evaluations=evaluations,
+                )
+        results.append(case)
+        print(
+            f"{case['generator']:>10} {case['size']:>3} {case['task']:>15} "
+            f"{case['engine']:>12} "
+            + (
+                f"{case['seconds']:10.4f}s {case['peak_bytes'] / 1024:10.0f}KiB "
+                f"{case['evaluations']:>10} evaluations"
+                if "seconds" in case
+                else f"skipped: {case['skipped']}"
+            )
+        )
+
+    with open(args.output, "w") as file:
+        json.dump(
+            {
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "results": results,
+            },
+            file,
+            indent=2,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,386 @@
+"""
+Knowledge compilation into deterministic decomposable negation normal form
+(d-DNNF), for model counting and probabilities.
+
+A sentence is encoded into clauses (see `sat.CNF`) and compiled top down:
+after unit propagation, the clauses left are split into components that
+share no variables, and each component branches on one of its symbols.
+Components are cached by their remaining clauses and variables, so a
+subproblem reached again on another branch is compiled only once. The
+circuit that results is
+
+- decomposable: the operands of a conjunction share no symbols
+- deterministic: the operands of a disjunction have no model in common
+- smooth: the operands of a disjunction mention the same symbols
+
+so the number of models, the weighted number of models, and the marginal
+of every symbol each take one pass over the circuit. The auxiliary
+variables of the encoding are determined by the symbols, so they are left
+out of the circuit without changing any count.
+
+    circuit = compile_circuit(knowledge)
+    circuit.count()
+    circuit.marginals({"AKnight": (0.9, 0.1)})["AKnave"]
+"""
+
+from sat import CNF
+
+
+class Circuit:
+    """
+    A smooth d-DNNF circuit. Nodes are hash-consed and numbered in
+    topological order, operands first. Each node is one of
+
+    - ("true",) or ("false",)
+    - ("literal", name, value)
+    - ("free", name): name may have either value, that is name ∨ ¬name
+    - ("and", operands) or ("or", operands), with operands as node numbers
+
+    Weights map symbol names to (weight if true, weight if false). A prior
+    probability p is the pair (p, 1 - p). Symbols without a weight count
+    as (1, 1), which is also what equally likely values amount to once
+    counts are normalized.
+    """
+
+    def __init__(self):
+        self.nodes = []
+        self.unique = {}
+        self.true = self.node(("true",))
+        self.false = self.node(("false",))
+        self.root = self.false
+        self.symbols = set()
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def node(self, key):
+        index = self.unique.get(key)
+        if index is None:
+            index = len(self.nodes)
+            self.nodes.append(key)
+            self.unique[key] = index
+        return index
+
+    def literal(self, name, value):
+        return self.node(("literal", name, value))
+
+    def free(self, name):
+        return self.node(("free", name))
+
+    def conjunction(self, operands):
+        operands = set(operands)
+        if self.false in operands:
+            return self.false
+        operands.discard(self.true)
+        if len(operands) <= 1:
+            return operands.pop() if operands else self.true
+        return self.node(("and", tuple(sorted(operands))))
+
+    def disjunction(self, operands):
+        operands = [operand for operand in operands if operand != self.false]
+        if len(operands) <= 1:
+            return operands[0] if operands else self.false
+        return self.node(("or", tuple(operands)))
+
+    def values(self, weights=None):
+        """Returns the weighted count of models of every node."""
+        weights = weights or {}
+        values = []
+        for node in self.nodes:
+            kind = node[0]
+            if kind == "and":
+                value = 1
+                for operand in node[1]:
+                    value *= values[operand]
+            elif kind == "or":
+                value = sum(values[operand] for operand in node[1])
+            elif kind == "literal":
+                value = weights.get(node[1], (1, 1))[0 if node[2] else 1]
+            elif kind == "free":
+                value = sum(weights.get(node[1], (1, 1)))
+            else:
+                value = int(kind == "true")
+            values.append(value)
+        return values
+
+    def count(self):
+        """Returns the number of models."""
+        return self.values()[self.root]
+
+    def weighted_count(self, weights=None):
+        """
+        Returns the sum over all models of the product of the weights of
+        their values. With prior probabilities as weights, this is the
+        probability that the compiled sentence holds.
+        """
+        return self.values(weights)[self.root]
+
+    def marginals(self, weights=None):
+        """
+        Returns the probability of every symbol being true, given that the
+        compiled sentence holds.
+
+        The weighted count is a polynomial in the weights, and every model
+        contributes a term with exactly one weight of each symbol. So the
+        weight of the models where a symbol is true is that weight times
+        the derivative of the count with respect to it. The derivatives of
+        all nodes are found in one pass back from the root.
+        """
+        weights = weights or {}
+        values = self.values(weights)
+        total = values[self.root]
+        if not total:
+            raise ValueError("the compiled sentence has no models")
+
+        derivatives = [0] * len(self.nodes)
+        derivatives[self.root] = 1
+        for index in range(self.root, -1, -1):
+            derivative = derivatives[index]
+            node = self.nodes[index]
+            if not derivative or node[0] not in ("and", "or"):
+                continue
+            operands = node[1]
+            if node[0] == "or":
+                for operand in operands:
+                    derivatives[operand] += derivative
+                continue
+
+            # The derivative for each operand is the product of the other
+            # operands, found from prefix and suffix products
+            suffix = [1]
+            for operand in reversed(operands):
+                suffix.append(suffix[-1] * values[operand])
+            prefix = derivative
+            for i, operand in enumerate(operands):
+                derivatives[operand] += prefix * suffix[len(operands) - i - 1]
+                prefix *= values[operand]
+
+        true = dict.fromkeys(self.symbols, 0)
+        for index, node in enumerate(self.nodes):
+            if node[0] == "free" or node[0] == "literal" and node[2]:
+                true[node[1]] += derivatives[index]
+        return {
+            name: weights.get(name, (1, 1))[0] * derivative / total
+            for name, derivative in true.items()
+        }
+
+
+def run(task):
+    """
+    Runs a generator that yields subtasks, also generators, and is sent
+    back their results. The generators are kept on a stack instead of the
+    call stack, so deep branching cannot exceed the recursion limit.
+    """
+    stack = [task]
+    result = None
+    while stack:
+        try:
+            subtask = stack[-1].send(result)
+        except StopIteration as stop:
+            stack.pop()
+            result = stop.value
+        else:
+            stack.append(subtask)
+            result = None
+    return result
+
+
+class Compiler:
+    """Compiles the clauses of a `sat.CNF` into a `Circuit`."""
+
+    def __init__(self, cnf):
+        self.names = cnf.names
+        self.clauses = []
+        for clause in cnf.clauses:
+            clause = list(dict.fromkeys(clause))
+            if not any(-literal in clause for literal in clause):
+                self.clauses.append(clause)
+
+        # Clauses by the literals in them
+        self.occurrences = {}
+        for index, clause in enumerate(self.clauses):
+            for literal in clause:
+                self.occurrences.setdefault(literal, []).append(index)
+
+        # Value of every literal: 1 if true, -1 if false, 0 if unassigned.
+        # Literal -v is at index 2n + 1 - v of the list, as negative indices
+        # count from the end, so both signs index it directly.
+        self.truth = [0] * (2 * cnf.num_variables + 1)
+        self.trail = []
+        self.circuit = Circuit()
+
+        # Compiled components, by their clauses and unassigned variables
+        self.cache = {}
+
+    def propagate(self, literals):
+        """
+        Assigns literals and every literal they imply by unit propagation.
+        Returns False on a conflict.
+        """
+        truth = self.truth
+        pending = list(literals)
+        while pending:
+            literal = pending.pop()
+            if truth[literal]:
+                if truth[literal] < 0:
+                    return False
+                continue
+            truth[literal] = 1
+            truth[-literal] = -1
+            self.trail.append(literal)
+            for index in self.occurrences.get(-literal, ()):
+                clause = self.clauses[index]
+                values = [truth[other] for other in clause]
+                if 1 in values:
+                    continue
+                unassigned = values.count(0)
+                if not unassigned:
+                    return False
+                if unassigned == 1:
+                    pending.append(clause[values.index(0)])
+        return True
+
+    def undo(self, mark):
+        """Unassigns everything assigned since the trail had length mark."""
+        for literal in self.trail[mark:]:
+            self.truth[literal] = self.truth[-literal] = 0
+        del self.trail[mark:]
+
+    def components(self, indices):
+        """
+        Splits the clauses at indices that are not satisfied yet into
+        groups that share no unassigned variable. Returns each group as
+        (variables, indices).
+        """
+        # Group of every variable seen, as (variables, indices). When a
+        # clause joins groups, the smaller ones are merged into the largest
+        owner = {}
+        truth = self.truth
+        for index in indices:
+            clause = self.clauses[index]
+            values = [truth[literal] for literal in clause]
+            if 1 in values:
+                continue
+            variables = [abs(literal) for literal in clause if not truth[literal]]
+            group = None
+            for var in variables:
+                other = owner.get(var)
+                if other is None or other is group:
+                    continue
+                if group is None:
+                    group = other
+                    continue
+                if len(other[0]) > len(group[0]):
+                    group, other = other, group
+                group[0].update(other[0])
+                group[1].extend(other[1])
+                for moved in other[0]:
+                    owner[moved] = group
+            if group is None:
+                group = (set(), [])
+            group[0].update(variables)
+            group[1].append(index)
+            for var in variables:
+                owner[var] = group
+        return list({id(group): group for group in owner.values()}.values())
+
+    def branch_variable(self, variables, indices):
+        """Picks the variable to branch on: the symbol in the most clauses."""
+        occurrences = dict.fromkeys(variables, 0)
+        for index in indices:
+            for literal in self.clauses[index]:
+                if abs(literal) in occurrences:
+                    occurrences[abs(literal)] += 1
+        symbols = [var for var in variables if var in self.names]
+        return max(symbols or variables, key=lambda var: (occurrences[var], -var))
+
+    def component(self, variables, indices):
+        key = (frozenset(indices), frozenset(variables))
+        node = self.cache.get(key)
+        if node is None:
+            symbols = [var for var in variables if var in self.names]
+            var = self.branch_variable(variables, indices)
+            branches = []
+            for literal in (var, -var):
+                mark = len(self.trail)
+                if self.propagate([literal]):
+                    branches.append((yield self.residual(indices, mark, symbols)))
+                self.undo(mark)
+            node = self.circuit.disjunction(branches)
+            self.cache[key] = node
+        return node
+
+    def residual(self, indices, mark, symbols):
+        """
+        Compiles the clauses at indices under the assignment, where mark is
+        where the trail stood before them, and symbols are the symbols they
+        mentioned then. Symbols no clause constrains any more are free.
+        """
+        operands = []
+        covered = set()
+        for literal in self.trail[mark:]:
+            var = abs(literal)
+            if var in self.names:
+                operands.append(self.circuit.literal(self.names[var], literal > 0))
+                covered.add(var)
+        for variables, component in self.components(indices):
+            node = yield self.component(variables, component)
+            if node == self.circuit.false:
+                return node
+            operands.append(node)
+            covered.update(variables)
+        operands.extend(
+            self.circuit.free(self.names[var]) for var in symbols if var not in covered
+        )
+        return self.circuit.conjunction(operands)
+
+    def compile(self, symbols=()):
+        """
+        Returns the circuit of the clauses, over their symbols and any
+        other symbols given, which are left free.
+        """
+        circuit = self.circuit
+        circuit.symbols = set(self.names.values()) | set(symbols)
+        units = [clause[0] for clause in self.clauses if len(clause) == 1]
+        if all(self.clauses) and self.propagate(units):
+            root = run(self.residual(range(len(self.clauses)), 0, list(self.names)))
+            extra = circuit.symbols - set(self.names.values())
+            circuit.root = circuit.conjunction(
+                [root] + [circuit.free(name) for name in sorted(extra)]
+            )
+        self.undo(0)
+        return circuit
+
+
+def compile_circuit(sentence, symbols=()):
+    """
+    Compiles sentence into a d-DNNF circuit over its symbols, and over
+    symbols as well if given.
+    """
+    cnf = CNF()
+    cnf.require(sentence)
+    return Compiler(cnf).compile(symbols)
+
+
+def count(sentence, symbols=()):
+    """Returns the number of models of sentence over its symbols and symbols."""
+    return compile_circuit(sentence, symbols).count()
+
+
+def probability(knowledge, query, weights=None):
+    """
+    Returns the probability of query given knowledge, with independent
+    priors on the symbols given as weights (see `Circuit`).
+    """
+    symbols = knowledge.symbols() | query.symbols()
+    total = compile_circuit(knowledge, symbols).weighted_count(weights)
+    if not total:
+        raise ValueError("knowledge has no models")
+
+    # The clauses of both are joined directly, as a conjunction of the two
+    # would share knowledge and stop the caller adding to it
+    cnf = CNF()
+    cnf.require(knowledge)
+    cnf.require(query)
+    both = Compiler(cnf).compile(symbols)
+    return both.weighted_count(weights) / total
@@ -0,0 +1,404 @@
+"""
+Reading and writing knowledge bases as text.
+
+DIMACS CNF files are read in one batch: every clause becomes a disjunction
+of symbols named by their variable numbers, and the symbols and their
+negations are built once per variable. Formulas in the infix syntax that
+`formula()` emits (¬, ∧, ∨, =>, <=>, or ^, v, -> as better_logic writes
+them, plus ExactlyOne(...), AtMostK(...) and AtLeastK(...)) are parsed
+with an operator stack instead of recursion, so deeply nested input is
+fine. Sentences are built with a builder algebra, such as
+`logic.builder`.
+
+Formulas are written the same way, except that a symbol whose name would
+not read back as itself, such as one holding a parenthesis or a comma,
+is written in double quotes.
+"""
+
+import gc
+import re
+from contextlib import contextmanager
+
+import preprocess
+from sat import CNF
+
+# Binding strength and associativity of the binary connectives
+PRECEDENCE = {"and": 4, "or": 3, "implies": 2, "iff": 1}
+RIGHT_ASSOCIATIVE = {"implies"}
+
+OPERATORS = {
+    "¬": "not",
+    "~": "not",
+    "∧": "and",
+    "^": "and",
+    "∨": "or",
+    "=>": "implies",
+    "->": "implies",
+    "<=>": "iff",
+}
+
+TOKENS = re.compile(
+    r"(<=>|=>|->|[¬~∧^∨(),])"
+    r'|\s*"((?:[^"\\]|\\.)*)"\s*'
+    r"|((?:(?!<=>|=>|->)[^¬~∧^∨(),])+)"
+)
+ESCAPED = re.compile(r"\\(.)")
+WORD = re.compile(r"\w+")
+# Variable numbers as DIMACS writes them, with no sign or leading zeros
+NUMBER = re.compile(r"[1-9][0-9]*")
+CARDINALITY = re.compile(r"ExactlyOne|AtMost(\d+)|AtLeast(\d+)")
+
+# better_logic writes disjunctions as " v " between operands
+DISJUNCTION_WORD = re.compile(r"(?:^|\s+)v(?:\s+|$)")
+DIALECTS = ("logic", "better_logic")
+
+
+@contextmanager
+def collection_paused():
+    """
+    Pauses the cyclic garbage collector. Building a large knowledge base
+    allocates millions of objects, and every collection would scan them all
+    again without ever finding garbage.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def read_dimacs(lines, builder):
+    """
+    Returns the conjunction of the clauses in lines of a DIMACS CNF file.
+    Variable n becomes the symbol named "n".
+
+    The numbers are split out of all the lines at once, and the symbols
+    and their negations built once per variable, so every clause is just
+    a list of literals looked up before its disjunction is built.
+    """
+    body = []
+    for line in lines:
+        if line.startswith("%"):
+            break
+        if line and line[0] not in "cp\n":
+            body.append(line)
+    numbers = list(map(int, " ".join(body).split()))
+
+    with collection_paused():
+        literals = {}
+        for number in set(numbers):
+            literal = builder.symbol(str(abs(number)))
+            literals[number] = builder.negation(literal) if number < 0 else literal
+
+        # Every 0 ends a clause, and the last may be left unterminated
+        ends = [i for i, number in enumerate(numbers) if number == 0]
+        starts = [0] + [end + 1 for end in ends]
+        if starts[-1] < len(numbers):
+            ends.append(len(numbers))
+        clauses = [
+            builder.disjunction([literals[number] for number in numbers[start:end]])
+            for start, end in zip(starts, ends)
+        ]
+        return builder.conjunction(clauses)
+
+
+def load_dimacs(path, builder):
+    with open(path) as file:
+        return read_dimacs(file, builder)
+
+
+def clauses(sentence):
+    """
+    Returns the clauses of sentence as lists of (name, value) literals, or
+    None unless sentence is a conjunction of disjunctions of literals.
+    """
+    # Clauses share their literals, so each is looked at once
+    literals = {}
+
+    def literal(operand):
+        key = id(operand)
+        if key not in literals:
+            literals[key] = preprocess.literal(operand)
+        return literals[key]
+
+    result = []
+    for conjunct in preprocess.conjuncts(sentence):
+        kind, *operands = preprocess.shape(conjunct)
+        if kind != "or":
+            operands = [conjunct]
+        clause = [literal(operand) for operand in operands]
+        if None in clause:
+            return None
+        result.append(clause)
+    return result
+
+
+def write_dimacs(sentence, file):
+    """
+    Writes sentence to file in DIMACS CNF. Conjunctions of clauses are
+    written as they are, anything else is encoded with auxiliary
+    variables first. Symbols named by positive integers, written the
+    way DIMACS writes them, keep their number; the others, "007" among
+    them, are numbered in sorted order after them.
+    """
+    with collection_paused():
+        literal_clauses = clauses(sentence)
+        if literal_clauses is None:
+            cnf = CNF()
+            cnf.require(sentence)
+            variables = cnf.variables
+            numbered = cnf.clauses
+        else:
+            names = sentence.symbols()
+            variables = {name: int(name) for name in names if NUMBER.fullmatch(name)}
+            start = max(variables.values(), default=0)
+            for i, name in enumerate(sorted(names - variables.keys())):
+                variables[name] = start + i + 1
+            numbered = [
+                [
+                    variables[name] if value else -variables[name]
+                    for name, value in clause
+                ]
+                for clause in literal_clauses
+            ]
+
+    num_variables = max(
+        [abs(literal) for clause in numbered for literal in clause], default=0
+    )
+    file.write(f"p cnf {num_variables} {len(numbered)}\n")
+    for name, variable in sorted(variables.items(), key=lambda item: item[1]):
+        if name != str(variable):
+            file.write(f"c {variable} {name}\n")
+    file.writelines(
+        " ".join(map(str, clause)) + " 0\n" if clause else "0\n" for clause in numbered
+    )
+
+
+def save_dimacs(sentence, path):
+    with open(path, "w") as file:
+        write_dimacs(sentence, file)
+
+
+def tokenize(text, dialect="logic"):
+    """
+    Yields (kind, text) tokens, where kind is "name" or an operator.
+
+    Names may hold spaces, even at either end: formula() parenthesizes
+    such names, so whitespace next to a parenthesis, or before a comma
+    between terms, is part of the name. Elsewhere it only separates
+    tokens, except that just the one space formula() writes after a
+    comma is dropped. A name in double quotes is taken as it is, with
+    backslashes escaping quotes and backslashes.
+
+    dialect names the module whose formula() wrote text: a lone v is a
+    disjunction in "better_logic", and part of a name in "logic".
+    """
+    if dialect not in DIALECTS:
+        raise ValueError(f"unknown formula dialect {dialect}")
+    text = text.strip()
+    pieces = []
+    position = 0
+    while position < len(text):
+        match = TOKENS.match(text, position)
+        if match is None:
+            raise ValueError(f"unexpected character at {position}: {text[position]}")
+        position = match.end()
+        pieces.append(match.groups())
+
+    for i, (operator, quoted, name) in enumerate(pieces):
+        if operator is not None:
+            yield OPERATORS.get(operator, operator), operator
+            continue
+        if quoted is not None:
+            yield "name", ESCAPED.sub(r"\1", quoted)
+            continue
+        before = pieces[i - 1][0] if i > 0 else None
+        after = pieces[i + 1][0] if i + 1 < len(pieces) else None
+        if before == ",":
+            name = name.removeprefix(" ")
+        elif before != "(":
+            name = name.lstrip()
+        if after not in (")", ","):
+            name = name.rstrip()
+        if not name.strip():
+            continue
+        if dialect == "logic":
+            yield "name", name
+            continue
+        # A lone v between names is a disjunction
+        parts = DISJUNCTION_WORD.split(name)
+        for j, part in enumerate(parts):
+            if j > 0:
+                yield "or", "v"
+            if part:
+                yield "name", part
+
+
+def parse(text, builder, dialect="logic"):
+    """Parses a sentence in infix syntax, see tokenize for dialect."""
+    operands = []
+
+    # Pending operators: (kind, arity) for connectives, where arity grows
+    # as a chain like a ∧ b ∧ c is read, or ("(", name, start) for groups
+    operators = []
+    expect_operand = True
+
+    def reduce():
+        kind, arity = operators.pop()
+        if kind == "not":
+            operands.append(builder.negation(operands.pop()))
+            return
+        values = operands[-arity:]
+        del operands[-arity:]
+        if kind == "and":
+            operands.append(builder.conjunction(values))
+        elif kind == "or":
+            operands.append(builder.disjunction(values))
+        elif kind == "implies":
+            operands.append(builder.implication(*values))
+        else:
+            operands.append(builder.biconditional(*values))
+
+    def close(kind, text):
+        while operators and operators[-1][0] != "(":
+            reduce()
+        if not operators or (kind == "," and operators[-1][1] is None):
+            raise ValueError(f"unexpected {text}")
+        if kind == ")":
+            _, name, start = operators.pop()
+            if name is not None:
+                call(name, start)
+
+    def call(name, start):
+        values = operands[start:]
+        del operands[start:]
+        match = CARDINALITY.fullmatch(name)
+        if match.group(1) is not None:
+            low, high = 0, int(match.group(1))
+        elif match.group(2) is not None:
+            low, high = int(match.group(2)), len(values)
+        else:
+            low, high = 1, 1
+        operands.append(builder.cardinality(values, low, high))
+
+    tokens = list(tokenize(text, dialect))
+    for i, (kind, token) in enumerate(tokens):
+        if expect_operand:
+            if kind == "name":
+                following = tokens[i + 1][0] if i + 1 < len(tokens) else None
+                if following == "(" and CARDINALITY.fullmatch(token):
+                    operators.append(("(", token, len(operands)))
+                    tokens[i + 1] = ("call", "(")
+                else:
+                    operands.append(builder.symbol(token))
+                    expect_operand = False
+            elif kind == "not":
+                operators.append(("not", 1))
+            elif kind == "(":
+                operators.append(("(", None, None))
+            elif kind == "call":
+                continue
+            elif (
+                kind == ")"
+                and operators
+                and operators[-1][0] == "("
+                and operators[-1][1]
+            ):
+                # Cardinality constraint with no terms
+                close(kind, token)
+                expect_operand = False
+            else:
+                raise ValueError(f"expected a sentence before {token}")
+        elif kind in PRECEDENCE:
+            precedence = PRECEDENCE[kind]
+            while operators and operators[-1][0] not in ("(", kind):
+                top = operators[-1][0]
+                if top != "not" and PRECEDENCE[top] < precedence:
+                    break
+                reduce()
+            if operators and operators[-1][0] == kind:
+                top_kind, arity = operators.pop()
+                if kind in ("and", "or"):
+                    operators.append((kind, arity + 1))
+                elif kind in RIGHT_ASSOCIATIVE:
+                    operators.append((top_kind, arity))
+                    operators.append((kind, 2))
+                else:
+                    operators.append((top_kind, arity))
+                    reduce()
+                    operators.append((kind, 2))
+            else:
+                operators.append((kind, 2))
+            expect_operand = True
+        elif kind in (")", ","):
+            close(kind, token)
+            expect_operand = kind == ","
+        else:
+            raise ValueError(f"expected a connective before {token}")
+
+    if expect_operand:
+        raise ValueError("unexpected end of sentence")
+    while operators:
+        if operators[-1][0] == "(":
+            raise ValueError("unbalanced (")
+        reduce()
+    return operands[0]
+
+
+def read_formulas(lines, builder, dialect="logic"):
+    """Returns the conjunction of the sentences on the non-blank lines."""
+    with collection_paused():
+        sentences = [parse(line, builder, dialect) for line in lines if line.strip()]
+        return builder.conjunction(sentences)
+
+
+def load_formulas(path, builder, dialect="logic"):
+    with open(path) as file:
+        return read_formulas(file, builder, dialect)
+
+
+def quote(name):
+    """
+    Returns name as written in a formula: as it is if it reads back as
+    itself in either dialect, and in double quotes otherwise.
+    """
+    if WORD.fullmatch(name) and name != "v":
+        return name
+    if '"' not in name and list(tokenize(name, "better_logic")) == [("name", name)]:
+        return name
+    return '"' + name.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def formula(sentence):
+    """
+    Returns the formula of sentence as formula() writes it, with names
+    quoted where needed and disjunctions written with ∨, so that it reads
+    back the same whichever dialect it is read in.
+    """
+    pieces = []
+    stack = [sentence]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, str):
+            pieces.append(" ∨ " if item == " v " else item)
+            continue
+        kind, *operands = preprocess.shape(item)
+        if kind == "symbol":
+            pieces.append(quote(operands[0]))
+        else:
+            stack.extend(reversed(item.layout()))
+    return "".join(pieces)
+
+
+def write_formulas(sentence, file):
+    """Writes sentence to file, one top-level conjunct per line."""
+    with collection_paused():
+        for conjunct in preprocess.conjuncts(sentence):
+            file.write(formula(conjunct) + "\n")
+
+
+def save_formulas(sentence, path):
+    with open(path, "w") as file:
+        write_formulas(sentence, file)
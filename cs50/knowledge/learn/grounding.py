@@ -0,0 +1,188 @@
+"""
+Typed domains and rule templates that are grounded lazily.
+
+A theory declares domains of entities, predicates over them, and rules
+quantified over some of the domains, such as "every person is in exactly
+one house". Nothing is grounded up front. Asking about a set of atoms
+grounds only the rule instances that mention them, then the instances
+mentioning the atoms those bring in, and so on. Every grounded instance is
+cached, so a roster with millions of potential atoms only pays for the
+part a query reaches.
+
+A rule instance is found through the atoms of its body, each of which
+must mention at least one of the entities the instance is bound to. The
+atoms a query never reaches are assumed to be satisfiable on their own,
+and are left out when the query is checked.
+"""
+
+import itertools
+
+import sat
+
+
+class Domain:
+    """A named, typed set of entities."""
+
+    def __init__(self, name, members):
+        self.name = name
+        self.members = list(members)
+        self.index = set(self.members)
+
+    def __iter__(self):
+        return iter(self.members)
+
+    def __len__(self):
+        return len(self.members)
+
+    def __contains__(self, member):
+        return member in self.index
+
+    def __repr__(self):
+        return f"Domain({self.name})"
+
+
+class Predicate:
+    """
+    Ground atoms over typed arguments, named from template by
+    str.format with the arguments. Atoms are created on first use.
+    """
+
+    def __init__(self, theory, name, domains, template=None):
+        self.theory = theory
+        self.name = name
+        self.domains = domains
+        self.template = template or name + "(" + ", ".join(["{}"] * len(domains)) + ")"
+        self.atoms = {}
+
+    def __call__(self, *arguments):
+        atom = self.atoms.get(arguments)
+        if atom is None:
+            if len(arguments) != len(self.domains):
+                raise TypeError(f"{self.name} takes {len(self.domains)} arguments")
+            for argument, domain in zip(arguments, self.domains):
+                if argument not in domain:
+                    raise ValueError(f"{argument} is not in {domain.name}")
+            atom = self.theory.builder.symbol(self.template.format(*arguments))
+            self.atoms[arguments] = atom
+            self.theory.atoms[atom.formula()] = (self, arguments)
+        return atom
+
+
+class Rule:
+    """A sentence template quantified over one variable per domain given."""
+
+    def __init__(self, domains, template):
+        self.domains = domains
+        self.template = template
+        self.instances = {}
+
+    def instance(self, binding):
+        """Returns the sentence for binding, grounding it on first use."""
+        sentence = self.instances.get(binding)
+        if sentence is None:
+            sentence = self.template(*binding)
+            self.instances[binding] = sentence
+        return sentence
+
+    def bindings(self, predicate, arguments):
+        """
+        Yields the bindings whose instances may mention the given atom:
+        those with some variable bound to an argument of the atom from
+        its domain. The other variables range over their whole domains,
+        as the atom need not mention them.
+        """
+        seen = set()
+        for position, domain in enumerate(self.domains):
+            for argument, argument_domain in zip(arguments, predicate.domains):
+                if argument_domain is not domain:
+                    continue
+                choices = [
+                    [argument] if i == position else other
+                    for i, other in enumerate(self.domains)
+                ]
+                for binding in itertools.product(*choices):
+                    if binding not in seen:
+                        seen.add(binding)
+                        yield binding
+
+    def groundings(self):
+        """Yields every instance of the rule."""
+        for binding in itertools.product(*self.domains):
+            yield self.instance(binding)
+
+
+class Theory:
+    """
+    Domains, predicates, rules and ground facts. builder is the algebra
+    that creates sentences, such as `logic.builder`.
+    """
+
+    def __init__(self, builder):
+        self.builder = builder
+        self.domains = {}
+        self.rules = []
+        self.facts = {}
+
+        # Name of every atom created so far, to its predicate and arguments
+        self.atoms = {}
+
+    def domain(self, name, members):
+        self.domains[name] = Domain(name, members)
+        return self.domains[name]
+
+    def predicate(self, name, *domains, template=None):
+        return Predicate(self, name, domains, template)
+
+    def rule(self, domains, template):
+        """
+        Adds the rule that template(*binding) holds for every binding of
+        one entity from each of domains.
+        """
+        self.rules.append(Rule(domains, template))
+
+    def tell(self, sentence):
+        """Adds a ground fact."""
+        for name in sentence.symbols():
+            self.facts.setdefault(name, []).append(sentence)
+
+    def touching(self, name):
+        """Yields the facts and grounded rule instances that mention name."""
+        yield from self.facts.get(name, ())
+        if name not in self.atoms:
+            return
+        predicate, arguments = self.atoms[name]
+        for rule in self.rules:
+            for binding in rule.bindings(predicate, arguments):
+                sentence = rule.instance(binding)
+                if name in sentence.symbols():
+                    yield sentence
+
+    def ground(self, symbols=None):
+        """
+        Returns the conjunction of the facts and rule instances reachable
+        from the atoms named in symbols, or of everything if symbols is None.
+        """
+        if symbols is None:
+            sentences = [rule.groundings() for rule in self.rules]
+            facts = {id(fact): fact for facts in self.facts.values() for fact in facts}
+            return self.builder.conjunction(
+                list(itertools.chain(*sentences, facts.values()))
+            )
+
+        sentences = {}
+        visited = set()
+        pending = list(symbols)
+        while pending:
+            name = pending.pop()
+            if name in visited:
+                continue
+            visited.add(name)
+            for sentence in self.touching(name):
+                if id(sentence) not in sentences:
+                    sentences[id(sentence)] = sentence
+                    pending.extend(sentence.symbols() - visited)
+        return self.builder.conjunction(list(sentences.values()))
+
+    def entails(self, query):
+        """Checks if the part of the theory that query reaches entails it."""
+        return sat.entails(self.ground(query.symbols()), query)
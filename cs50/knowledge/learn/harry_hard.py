@@ -5,10 +5,13 @@ from better_logic import (
     And,
     Or,
     Implication,
-    check_knowledge,
+    ExactlyOne,
+    AtMostK,
+    builder,
     model_check,
 )
-
+from grounding import Theory
+from termcolor import cprint
 
 gilderoy = "Gilderoy"
 minerva = "Minerva"
@@ -20,61 +23,37 @@ hufflepuff = "Hufflepuff"
 ravenclaw = "Ravenclaw"
 slytherin = "Slytherin"
 
-persons = [gilderoy, minerva, pomona, horace]
-houses = [gryffindor, hufflepuff, ravenclaw, slytherin]
-
-knowledge = And([])
-symbols = []
+theory = Theory(builder)
+persons = theory.domain("person", [gilderoy, minerva, pomona, horace])
+houses = theory.domain("house", [gryffindor, hufflepuff, ravenclaw, slytherin])
 
-for person in persons:
-    for house in houses:
-        symbols.append(Symbol(f"{person}{house}"))
+# Symbols like GilderoyGryffindor are only created when a rule needs them
+sorted_into = theory.predicate("in", persons, houses, template="{0}{1}")
 
 
 # A PERSON IS IN ONE HOUSE
-for person in persons:
-    knowledge.add(Or([Symbol(f"{person}{house}") for house in houses]))
-
-
-# ONE PERSON IN ONE HOUSE
-for person in persons:
-    for house in houses:
-        knowledge.add(
-            Implication(
-                Symbol(f"{person}{house}"),
-                Not(
-                    Or(
-                        [
-                            Symbol(f"{person}{other_house}")
-                            for other_house in houses
-                            if house != other_house
-                        ]
-                    )
-                ),
-            )
-        )
+theory.rule(
+    [persons],
+    lambda person: ExactlyOne([sorted_into(person, house) for house in houses]),
+)
 
 
 # EACH HOUSE MUST ONLY HAVE ONE PERSON
-for house in houses:
-    for person in persons:
-        knowledge.add(
-            Implication(
-                Symbol(f"{person}{house}"),
-                Not(
-                    Or(
-                        [
-                            Symbol(f"{other_person}{house}")
-                            for other_person in persons
-                            if person != other_person
-                        ]
-                    )
-                ),
-            )
-        )
-
-knowledge.add(Or([Symbol(f"{gilderoy}{gryffindor}"), Symbol(f"{gilderoy}{ravenclaw}")]))
-knowledge.add(Not(Symbol(f"{pomona}{slytherin}")))
-knowledge.add(Symbol(f"{minerva}{gryffindor}"))
+theory.rule(
+    [houses],
+    lambda house: AtMostK(1, [sorted_into(person, house) for person in persons]),
+)
 
-check_knowledge(knowledge)
+theory.tell(Or([sorted_into(gilderoy, gryffindor), sorted_into(gilderoy, ravenclaw)]))
+theory.tell(Not(sorted_into(pomona, slytherin)))
+theory.tell(sorted_into(minerva, gryffindor))
+
+# Each question grounds only the rule instances its atoms reach
+atoms = [sorted_into(person, house) for person in persons for house in houses]
+for atom in sorted(atoms, key=lambda atom: atom.formula()):
+    if theory.entails(atom):
+        cprint(f"{atom.formula()}: YES", "green")
+    elif theory.entails(Not(atom)):
+        cprint(f"{atom.formula()}: NO", "red")
+    else:
+        print(f"{atom.formula()}: Maybe")
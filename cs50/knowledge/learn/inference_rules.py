@@ -8,4 +8,230 @@
 - DISTRIBUTIVE PROPERTY         a ^ (b v c)          :=         (a ^ b) v (a ^ c)
 - RESOLUTION ???                (a v b) ^ !a         :=         b
                                 (a v b) ^ (!a v c)   :=         b v c
+
+The elimination rules, De Morgan's and distribution are what turns a
+sentence into conjunctive normal form; once everything is a clause,
+resolution is the only rule needed. `resolve` proves KB |= query by
+deriving the empty clause from the clauses of KB ∧ ¬query.
 """
+
+import heapq
+import itertools
+import time
+from dataclasses import dataclass
+
+from sat import sequential_counter
+
+
+class ClauseLimitError(Exception):
+    pass
+
+
+@dataclass
+class Proof:
+    # None when the search gave up before deciding
+    entailed: bool | None
+    input_clauses: int
+    generated: int
+    kept: int
+    subsumed: int
+    seconds: float
+
+
+class ClauseSet:
+    """Clauses indexed by literal, with subsumption checks."""
+
+    def __init__(self):
+        self.occurs = {}
+        self.clauses = set()
+
+    def add(self, clause):
+        self.clauses.add(clause)
+        for literal in clause:
+            self.occurs.setdefault(literal, set()).add(clause)
+
+    def remove(self, clause):
+        self.clauses.discard(clause)
+        for literal in clause:
+            self.occurs.get(literal, set()).discard(clause)
+
+    def containing(self, literal):
+        return self.occurs.get(literal, ())
+
+    def subsumes(self, clause):
+        """Checks if some clause in the set is a subset of clause."""
+        return any(
+            other <= clause
+            for literal in clause
+            for other in self.containing(literal)
+            if len(other) <= len(clause)
+        )
+
+    def subsumed_by(self, clause):
+        """Returns the clauses in the set that clause is a subset of."""
+        rarest = min(clause, key=lambda literal: len(self.containing(literal)))
+        return [
+            other
+            for other in self.containing(rarest)
+            if other != clause and len(other) >= len(clause) and clause <= other
+        ]
+
+
+def tautology(clause):
+    return any(-literal in clause for literal in clause)
+
+
+def minimal(clauses):
+    """Returns the clauses that are not tautologies or subsumed by another."""
+    kept = ClauseSet()
+    for clause in sorted(set(clauses), key=len):
+        if not tautology(clause) and not kept.subsumes(clause):
+            kept.add(clause)
+    return frozenset(kept.clauses)
+
+
+class Clauses:
+    """
+    Algebra that turns a sentence into clauses over its own symbols, by
+    distributing disjunctions over conjunctions. Every subsentence gives
+    the pair (clauses of it, clauses of its negation), so negations need
+    no rewriting first. Literals are numbered symbols, negative when
+    negated. Raises ClauseLimitError past max_clauses clauses.
+    """
+
+    def __init__(self, max_clauses):
+        self.max_clauses = max_clauses
+        self.variables = {}
+
+    def symbol(self, name):
+        var = self.variables.setdefault(name, len(self.variables) + 1)
+        return frozenset([frozenset([var])]), frozenset([frozenset([-var])])
+
+    def negation(self, value):
+        positive, negative = value
+        return negative, positive
+
+    def both(self, conjuncts):
+        """Returns the clauses of the conjunction of sets of clauses."""
+        return minimal(itertools.chain(*conjuncts))
+
+    def either(self, disjuncts):
+        """Returns the clauses of the disjunction of sets of clauses."""
+        result = frozenset([frozenset()])
+        for clauses in disjuncts:
+            if len(result) * len(clauses) > self.max_clauses:
+                raise ClauseLimitError(f"more than {self.max_clauses} clauses")
+            result = minimal(a | b for a in result for b in clauses)
+        return result
+
+    def conjunction(self, values):
+        return (
+            self.both([positive for positive, _ in values]),
+            self.either([negative for _, negative in values]),
+        )
+
+    def disjunction(self, values):
+        negative, positive = self.conjunction([self.negation(v) for v in values])
+        return positive, negative
+
+    def implication(self, antecedent, consequent):
+        return self.disjunction([self.negation(antecedent), consequent])
+
+    def biconditional(self, left, right):
+        return self.conjunction(
+            [self.implication(left, right), self.implication(right, left)]
+        )
+
+    def cardinality(self, values, low, high):
+        return sequential_counter(self, values, low, high)
+
+
+def resolve(knowledge, query, max_clauses=100000):
+    """
+    Checks if knowledge entails query by resolution refutation.
+
+    knowledge ∧ ¬query is turned into clauses over its symbols only (see
+    `Clauses`), then saturated with the given-clause loop, always picking
+    the shortest clause next. The set of support comes first: every
+    resolution involves ¬query or a clause derived from it. That misses
+    proofs when the knowledge alone is inconsistent, so if it saturates,
+    the clauses of the knowledge are given as well, which makes the
+    search complete: saturating again means the query is not entailed.
+    Resolvents that are tautologies or subsumed by a kept clause are
+    dropped, and kept clauses subsumed by a new resolvent are deleted.
+    Gives up, with entailed None, after keeping max_clauses clauses.
+    """
+    start = time.perf_counter()
+    generated = 0
+    subsumed = 0
+    usable = ClauseSet()
+    kept = ClauseSet()
+    inputs = 0
+
+    def proof(entailed):
+        seconds = time.perf_counter() - start
+        return Proof(entailed, inputs, generated, len(kept.clauses), subsumed, seconds)
+
+    algebra = Clauses(max_clauses)
+    try:
+        clauses, _ = knowledge.fold(algebra)
+        _, negated = query.fold(algebra)
+    except ClauseLimitError:
+        return proof(None)
+    inputs = len(clauses) + len(negated)
+    if frozenset() in clauses or frozenset() in negated:
+        return proof(True)
+
+    for clause in clauses:
+        kept.add(clause)
+        usable.add(clause)
+
+    # The set of support starts as the clauses of the negated query.
+    # Clauses of the same length are given in the order they were found
+    order = itertools.count()
+    given_already = set()
+    support = []
+    for clause in negated:
+        if kept.subsumes(clause):
+            subsumed += 1
+            continue
+        for other in kept.subsumed_by(clause):
+            kept.remove(other)
+            usable.remove(other)
+            subsumed += 1
+        kept.add(clause)
+        heapq.heappush(support, (len(clause), next(order), clause))
+
+    complete = False
+    while True:
+        if not support:
+            if complete:
+                return proof(False)
+            # Give the clauses of the knowledge as well
+            complete = True
+            for clause in kept.clauses - given_already:
+                heapq.heappush(support, (len(clause), next(order), clause))
+            continue
+
+        _, _, given = heapq.heappop(support)
+        if given not in kept.clauses or given in given_already:
+            continue
+        given_already.add(given)
+        usable.add(given)
+        for literal in given:
+            for other in list(usable.containing(-literal)):
+                resolvent = (given - {literal}) | (other - {-literal})
+                generated += 1
+                if not resolvent:
+                    return proof(True)
+                if tautology(resolvent) or kept.subsumes(resolvent):
+                    subsumed += 1
+                    continue
+                for clause in kept.subsumed_by(resolvent):
+                    kept.remove(clause)
+                    usable.remove(clause)
+                    subsumed += 1
+                kept.add(resolvent)
+                heapq.heappush(support, (len(resolvent), next(order), resolvent))
+                if len(kept.clauses) > max_clauses:
+                    return proof(None)
@@ -0,0 +1,267 @@
+"""
+Simplification of knowledge bases before model checking.
+
+Unit facts among the top-level conjuncts of a knowledge base fix their
+symbols in every model, so they are substituted away and the constants
+folded through the connectives. Pure literals of KB ∧ ¬query (symbols
+that occur with one polarity only) can be fixed too without changing
+whether KB entails query. Only the residual sentences, over the symbols
+still undecided, need to be checked.
+"""
+
+
+class Shape:
+    """
+    Algebra that describes a single node: combining a sentence with its
+    own operands as the values gives (kind, operands...).
+    """
+
+    def symbol(self, name):
+        return ("symbol", name)
+
+    def negation(self, operand):
+        return ("not", operand)
+
+    def conjunction(self, operands):
+        return ("and", *operands)
+
+    def disjunction(self, operands):
+        return ("or", *operands)
+
+    def implication(self, antecedent, consequent):
+        return ("implies", antecedent, consequent)
+
+    def biconditional(self, left, right):
+        return ("iff", left, right)
+
+    def cardinality(self, operands, low, high):
+        return ("cardinality", *operands)
+
+
+def shape(sentence):
+    """Returns the kind of sentence's top node followed by its operands."""
+    return sentence.combine(Shape(), list(sentence.operands()))
+
+
+def conjuncts(sentence):
+    """Returns the conjuncts of sentence, flattening nested conjunctions."""
+    result = []
+    stack = [sentence]
+    while stack:
+        sentence = stack.pop()
+        kind, *operands = shape(sentence)
+        if kind == "and":
+            stack.extend(reversed(operands))
+        else:
+            result.append(sentence)
+    return result
+
+
+def literal(sentence):
+    """Returns (name, value) if sentence is a symbol or its negation."""
+    kind, *operands = shape(sentence)
+    if kind == "symbol":
+        return operands[0], True
+    if kind == "not":
+        kind, *operands = shape(operands[0])
+        if kind == "symbol":
+            return operands[0], False
+    return None
+
+
+class Simplifier:
+    """
+    Algebra that substitutes the values in assignment and folds constants.
+    Every subsentence becomes either True, False, or a residual sentence
+    made with builder.
+    """
+
+    def __init__(self, builder, assignment):
+        self.builder = builder
+        self.assignment = assignment
+
+    def symbol(self, name):
+        if name in self.assignment:
+            return self.assignment[name]
+        return self.builder.symbol(name)
+
+    def negation(self, value):
+        if isinstance(value, bool):
+            return not value
+        return self.builder.negation(value)
+
+    def conjunction(self, values):
+        if any(value is False for value in values):
+            return False
+        values = [value for value in values if value is not True]
+        if not values:
+            return True
+        if len(values) == 1:
+            return values[0]
+        return self.builder.conjunction(values)
+
+    def disjunction(self, values):
+        if any(value is True for value in values):
+            return True
+        values = [value for value in values if value is not False]
+        if not values:
+            return False
+        if len(values) == 1:
+            return values[0]
+        return self.builder.disjunction(values)
+
+    def implication(self, antecedent, consequent):
+        if antecedent is False or consequent is True:
+            return True
+        if antecedent is True:
+            return consequent
+        if consequent is False:
+            return self.negation(antecedent)
+        return self.builder.implication(antecedent, consequent)
+
+    def biconditional(self, left, right):
+        if isinstance(left, bool) and isinstance(right, bool):
+            return left == right
+        if isinstance(right, bool):
+            left, right = right, left
+        if left is True:
+            return right
+        if left is False:
+            return self.negation(right)
+        return self.builder.biconditional(left, right)
+
+    def cardinality(self, values, low, high):
+        # Terms known to be true use up the bounds, known false ones drop out
+        true = sum(value is True for value in values)
+        values = [value for value in values if not isinstance(value, bool)]
+        low, high = low - true, high - true
+        if high < 0 or low > len(values):
+            return False
+        if low <= 0 and high >= len(values):
+            return True
+        return self.builder.cardinality(values, max(low, 0), high)
+
+
+class Polarity:
+    """
+    Algebra giving, for every subsentence, the pair of sets of symbols
+    that occur in it positively and negatively.
+    """
+
+    def symbol(self, name):
+        return frozenset((name,)), frozenset()
+
+    def negation(self, value):
+        positive, negative = value
+        return negative, positive
+
+    def conjunction(self, values):
+        return (
+            frozenset().union(*[positive for positive, _ in values]),
+            frozenset().union(*[negative for _, negative in values]),
+        )
+
+    def disjunction(self, values):
+        return self.conjunction(values)
+
+    def implication(self, antecedent, consequent):
+        return self.conjunction([self.negation(antecedent), consequent])
+
+    def biconditional(self, left, right):
+        both = frozenset().union(*left, *right)
+        return both, both
+
+    def cardinality(self, values, low, high):
+        # A lower bound needs terms true, an upper bound needs them false
+        positive, negative = self.conjunction(values)
+        return (
+            (positive if low > 0 else frozenset())
+            | (negative if high < len(values) else frozenset()),
+            (negative if low > 0 else frozenset())
+            | (positive if high < len(values) else frozenset()),
+        )
+
+
+def substitute(sentence, builder, assignment):
+    """Returns sentence with assignment substituted and constants folded."""
+    if isinstance(sentence, bool) or not assignment:
+        return sentence
+    return sentence.fold(Simplifier(builder, assignment))
+
+
+def propagate(knowledge, assignment=None):
+    """
+    Repeatedly substitutes the unit facts among the top-level conjuncts of
+    knowledge. Returns the residual knowledge (True, False or a sentence)
+    and the assignment of the symbols it decided.
+    """
+    builder = knowledge.builder()
+    assignment = dict(assignment or {})
+    knowledge = substitute(knowledge, builder, assignment)
+    while not isinstance(knowledge, bool):
+        units = {}
+        for conjunct in conjuncts(knowledge):
+            unit = literal(conjunct)
+            if unit is None:
+                continue
+            name, value = unit
+            if units.get(name, value) != value:
+                return False, assignment
+            units[name] = value
+        if not units:
+            break
+        assignment.update(units)
+        knowledge = substitute(knowledge, builder, units)
+    return knowledge, assignment
+
+
+def simplify(knowledge, query):
+    """
+    Decides symbols from unit facts of knowledge and from pure literals
+    of knowledge ∧ ¬query, which keeps whether knowledge entails query.
+    Returns the residual knowledge and query (each True, False or a
+    sentence) and the assignment of the decided symbols.
+    """
+    builder = knowledge.builder()
+    assignment = {}
+    while True:
+        knowledge, assignment = propagate(knowledge, assignment)
+        query = substitute(query, builder, assignment)
+        if isinstance(knowledge, bool) or isinstance(query, bool):
+            break
+
+        positive, negative = knowledge.fold(Polarity())
+        query_positive, query_negative = query.fold(Polarity())
+        positive |= query_negative
+        negative |= query_positive
+        pure = {name: True for name in positive - negative}
+        pure.update({name: False for name in negative - positive})
+        if not pure:
+            break
+        assignment.update(pure)
+        knowledge = substitute(knowledge, builder, pure)
+        query = substitute(query, builder, pure)
+        if isinstance(knowledge, bool) or isinstance(query, bool):
+            break
+    return knowledge, query, assignment
+
+
+def residual(knowledge, query):
+    """
+    Simplifies the entailment knowledge |= query. Returns its answer when
+    simplification decides it, otherwise a residual (knowledge, query)
+    pair of sentences with the same answer.
+    """
+    builder = knowledge.builder()
+    knowledge, query, _ = simplify(knowledge, query)
+    if knowledge is False or query is True:
+        return True
+    if knowledge is True:
+        if query is False:
+            return False
+        knowledge = builder.conjunction([])
+    elif query is False:
+        # Built from scratch, as a sentence built from knowledge would
+        # share it and stop the caller adding to it
+        query = builder.negation(builder.conjunction([]))
+    return knowledge, query
@@ -0,0 +1,59 @@
+"""
+Dense integer ids for symbols, and models as bitmasks over them.
+
+Every symbol name is given the next free id when first seen, and a model
+is a single Python int whose bit i holds the value of the symbol with id i.
+Evaluating a symbol is then a shift and a mask, and moving to the next
+model flips one bit instead of copying a dict of names. Dict models are
+still accepted and converted with `encode` and `decode`.
+"""
+
+
+class SymbolTable:
+    def __init__(self, names=()):
+        self.ids = {}
+        self.names = []
+        for name in names:
+            self.id(name)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self.ids
+
+    def id(self, name):
+        """Returns the id of the symbol called name, assigning one if new."""
+        if name not in self.ids:
+            self.ids[name] = len(self.names)
+            self.names.append(name)
+        return self.ids[name]
+
+    def bit(self, name):
+        return 1 << self.id(name)
+
+    def encode(self, model):
+        """Returns the bitmask of a dict mapping symbol names to values."""
+        bits = 0
+        for name, value in model.items():
+            if value:
+                bits |= self.bit(name)
+        return bits
+
+    def decode(self, bits, names=None):
+        """Returns the dict of the values of names (all symbols by default)."""
+        names = self.names if names is None else names
+        return {name: bool(bits >> self.ids[name] & 1) for name in names}
+
+    def models(self, names):
+        """
+        Yields every assignment of names as a bitmask, in Gray code order:
+        each model differs from the previous one in a single bit.
+        """
+        bits = [self.bit(name) for name in sorted(names)]
+        model = 0
+        yield model
+        for step in range(1, 1 << len(bits)):
+            # The bit to flip is the lowest set bit of the step number
+            model ^= bits[(step & -step).bit_length() - 1]
+            yield model
@@ -0,0 +1,84 @@
+import itertools
+import random
+
+import better_logic
+import ddnnf
+import logic
+import sat
+from cache import EntailmentCache
+
+NAMES = "abcde"
+
+
+def random_sentence(builder, rng, depth):
+    """A random sentence over NAMES, built with builder."""
+    if depth == 0 or rng.random() < 0.25:
+        return builder.symbol(rng.choice(NAMES))
+    kind = rng.choice("NAOIBK")
+    operands = [random_sentence(builder, rng, depth - 1) for _ in range(3)]
+    if kind == "N":
+        return builder.negation(operands[0])
+    if kind == "A":
+        return builder.conjunction(operands)
+    if kind == "O":
+        return builder.disjunction(operands[:2])
+    if kind == "I":
+        return builder.implication(*operands[:2])
+    if kind == "B":
+        return builder.biconditional(*operands[:2])
+    low = rng.randint(0, 2)
+    return builder.cardinality(operands, low, rng.randint(low, 3))
+
+
+def models(sentence):
+    """Every model of sentence over NAMES, found by brute force."""
+    for values in itertools.product((True, False), repeat=len(NAMES)):
+        model = dict(zip(NAMES, values))
+        if sentence.evaluate(model):
+            yield model
+
+
+def test_engines_match_enumeration():
+    rng = random.Random(0)
+    for module, engines in (
+        (logic, ["cdcl", "compiled", "bdd"]),
+        (better_logic, ["cdcl", "compiled", "bdd", "bits"]),
+    ):
+        for _ in range(100):
+            knowledge = random_sentence(module.builder, rng, 4)
+            query = random_sentence(module.builder, rng, 2)
+            expected = module.model_check(knowledge, query)
+            for engine in engines:
+                assert module.model_check(knowledge, query, engine) == expected
+                assert module.model_check(knowledge, query, engine, True) == expected
+
+
+def test_cache_gives_the_same_answers():
+    cache = EntailmentCache()
+    for _ in range(2):
+        rng = random.Random(1)
+        for _ in range(50):
+            knowledge = random_sentence(logic.builder, rng, 3)
+            query = random_sentence(logic.builder, rng, 2)
+            expected = logic.model_check(knowledge, query)
+            assert logic.model_check(knowledge, query, cache=cache) == expected
+    assert cache.hits >= 50
+
+
+def test_satisfiable_finds_a_model():
+    rng = random.Random(2)
+    for _ in range(200):
+        sentence = random_sentence(logic.builder, rng, 4)
+        model = sat.satisfiable(sentence)
+        if model is None:
+            assert not any(models(sentence))
+        else:
+            full = {name: model.get(name, False) for name in NAMES}
+            assert sentence.evaluate(full)
+
+
+def test_count_matches_enumeration():
+    rng = random.Random(3)
+    for _ in range(200):
+        sentence = random_sentence(logic.builder, rng, 4)
+        assert ddnnf.count(sentence, set(NAMES)) == len(list(models(sentence)))
@@ -0,0 +1,65 @@
+import io
+import random
+
+import better_logic
+import formats
+import logic
+from logic import And, Not, Or, Symbol, model_check
+
+
+def roundtrip(sentence, builder, dialect="logic"):
+    file = io.StringIO()
+    formats.write_formulas(sentence, file)
+    file.seek(0)
+    return formats.read_formulas(file, builder, dialect)
+
+
+def test_names_read_back_as_written():
+    names = ["v", "a v b", "f(x)", "x, y", " padded ", 'say "hi"', "=>", "¬"]
+    for module in (logic, better_logic):
+        symbols = [module.builder.symbol(name) for name in names]
+        knowledge = module.builder.conjunction(
+            [
+                module.builder.disjunction(symbols[:2]),
+                module.builder.implication(symbols[2], symbols[3]),
+                module.builder.cardinality(symbols[4:], 0, 1),
+            ]
+        )
+        for dialect in ("logic", "better_logic"):
+            back = roundtrip(knowledge, module.builder, dialect)
+            assert back.symbols() == set(names)
+            assert back.formula() == knowledge.formula()
+
+
+def test_lone_v_is_a_disjunction_only_for_better_logic():
+    assert formats.parse("a v b", logic.builder).formula() == "a v b"
+    disjunction = formats.parse("a v b", better_logic.builder, "better_logic")
+    assert disjunction.symbols() == {"a", "b"}
+
+
+def test_dimacs_numbers_only_canonical_names():
+    knowledge = And(Or(Symbol("007"), Symbol("7")), Not(Symbol("7")))
+    file = io.StringIO()
+    formats.write_dimacs(knowledge, file)
+    file.seek(0)
+    back = formats.read_dimacs(file, logic.builder)
+    assert back.symbols() == {"7", "8"}
+    assert model_check(back, Symbol("8"))
+
+
+def test_dimacs_roundtrip_matches_model_check():
+    rng = random.Random(0)
+    symbols = [Symbol(str(i)) for i in range(1, 7)]
+    for _ in range(50):
+        knowledge = And(
+            *[
+                Or(*[rng.choice((s, Not(s))) for s in rng.sample(symbols, 3)])
+                for _ in range(rng.randint(1, 8))
+            ]
+        )
+        file = io.StringIO()
+        formats.write_dimacs(knowledge, file)
+        file.seek(0)
+        back = formats.read_dimacs(file, logic.builder)
+        assert back.symbols() == knowledge.symbols()
+        assert model_check(knowledge, back) and model_check(back, knowledge)
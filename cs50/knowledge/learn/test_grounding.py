@@ -0,0 +1,56 @@
+import itertools
+import random
+
+from better_logic import And, ExactlyOne, Not, Or, builder, model_check
+from grounding import Theory
+
+
+def houses_theory(seed=None):
+    """
+    A small sorting puzzle with a rule over two persons and a house, and
+    a few random facts if seed is given.
+    """
+    theory = Theory(builder)
+    persons = theory.domain("person", ["A", "B", "C"])
+    houses = theory.domain("house", ["X", "Y", "Z"])
+    sorted_into = theory.predicate("in", persons, houses)
+
+    theory.rule(
+        [persons],
+        lambda person: ExactlyOne([sorted_into(person, house) for house in houses]),
+    )
+    # No two persons share a house
+    theory.rule(
+        [persons, persons, houses],
+        lambda first, second, house: (
+            Not(And([sorted_into(first, house), sorted_into(second, house)]))
+            if first != second
+            else And([])
+        ),
+    )
+
+    pairs = list(itertools.product(persons, houses))
+    if seed is None:
+        return theory, sorted_into, pairs
+    rng = random.Random(seed)
+    for person, house in rng.sample(pairs, rng.randint(1, 2)):
+        atom = sorted_into(person, house)
+        theory.tell(atom if rng.random() < 0.5 else Not(atom))
+    return theory, sorted_into, pairs
+
+
+def test_entails_matches_full_grounding():
+    for seed in range(20):
+        theory, sorted_into, pairs = houses_theory(seed)
+        knowledge = theory.ground()
+        for person, house in pairs:
+            atom = sorted_into(person, house)
+            for query in (atom, Not(atom)):
+                assert theory.entails(query) == model_check(knowledge, query)
+
+
+def test_rule_sharing_a_domain_is_reached_lazily():
+    theory, sorted_into, _ = houses_theory()
+    theory.tell(sorted_into("A", "X"))
+    assert theory.entails(Not(sorted_into("B", "X")))
+    assert theory.entails(Or([sorted_into("B", "Y"), sorted_into("B", "Z")]))
@@ -0,0 +1,58 @@
+import random
+
+from inference_rules import resolve
+from logic import (
+    And,
+    AtMostK,
+    Biconditional,
+    ExactlyOne,
+    Implication,
+    Not,
+    Or,
+    Symbol,
+    model_check,
+)
+
+SYMBOLS = [Symbol(name) for name in "abcde"]
+
+
+def random_sentence(rng, depth):
+    if depth == 0 or rng.random() < 0.25:
+        return rng.choice(SYMBOLS)
+    kind = rng.choice("NAOIBKE")
+    operands = [random_sentence(rng, depth - 1) for _ in range(3)]
+    if kind == "N":
+        return Not(operands[0])
+    if kind == "A":
+        return And(*operands)
+    if kind == "O":
+        return Or(*operands[:2])
+    if kind == "I":
+        return Implication(*operands[:2])
+    if kind == "B":
+        return Biconditional(*operands[:2])
+    if kind == "K":
+        return AtMostK(1, *operands)
+    return ExactlyOne(*operands[:2])
+
+
+def test_resolve_matches_model_check():
+    rng = random.Random(0)
+    for _ in range(300):
+        knowledge = random_sentence(rng, 5)
+        query = random_sentence(rng, 3)
+        proof = resolve(knowledge, query)
+        assert proof.entailed == model_check(knowledge, query)
+
+
+def test_resolve_with_inconsistent_knowledge():
+    a, b = SYMBOLS[:2]
+    assert resolve(And(a, Not(a)), b).entailed is True
+    assert resolve(And(a, Or(Not(a), b)), b).entailed is True
+    assert resolve(Or(a, b), b).entailed is False
+
+
+def test_resolve_gives_up_past_the_budget():
+    a, b = SYMBOLS[:2]
+    knowledge = And(*[Or(a, Symbol(f"x{i}"), Symbol(f"y{i}")) for i in range(20)])
+    assert resolve(knowledge, b, max_clauses=5).entailed is None
@@ -0,0 +1,50 @@
+import pickle
+
+import better_logic
+import logic
+
+
+def test_add_to_an_operand_returns_a_new_sentence():
+    a, b, c = logic.Symbol("a"), logic.Symbol("b"), logic.Symbol("c")
+    logic.And(logic.And(a, b))
+    rule = logic.And(a, b)
+    knowledge = logic.And(rule, c)
+    extended = rule.add(c)
+    assert rule.formula() == "a ∧ b"
+    assert extended.formula() == "a ∧ b ∧ c"
+    assert knowledge.formula() == "(a ∧ b) ∧ c"
+
+    bound = logic.AtMostK(1, a, b)
+    logic.Not(bound)
+    assert bound.add(c).formula() == "AtMost1(a, b, c)"
+    assert bound.formula() == "AtMost1(a, b)"
+
+
+def test_add_to_a_top_level_sentence_changes_it():
+    a, b = logic.Symbol("a"), logic.Symbol("b")
+    knowledge = logic.And(a)
+    assert knowledge.add(b) is knowledge
+    assert knowledge.formula() == "a ∧ b"
+
+    a, b, c = (
+        better_logic.Symbol("a"),
+        better_logic.Symbol("b"),
+        better_logic.Symbol("c"),
+    )
+    better_logic.And([better_logic.Or([a, b])])
+    rule = better_logic.Or([a, b])
+    knowledge = better_logic.And([rule])
+    assert rule.add(c).formula() == "a v b v c"
+    assert rule.formula() == "a v b"
+    assert knowledge.operands()[0].formula() == "a v b"
+    assert knowledge.add(c) is knowledge
+
+
+def test_deep_sentences_compare_after_unpickling():
+    sentence = logic.Symbol("x0")
+    for i in range(1, 100000):
+        sentence = logic.Implication(logic.Symbol(f"x{i}"), sentence)
+    copy = pickle.loads(pickle.dumps(sentence))
+    assert copy == sentence
+    assert logic.Not(copy) == logic.Not(sentence)
+    assert copy != logic.Implication(logic.Symbol("x0"), sentence)
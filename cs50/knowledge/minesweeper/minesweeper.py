@@ -1,33 +1,56 @@
 import itertools
+import math
 import random
 
+import numpy as np
+
+
+def neighbor_counts(board):
+    """
+    Returns, for every cell of a boolean array, how many
+    of the up to eight cells around it are true.
+    """
+    height, width = board.shape
+    padded = np.pad(board.astype(np.uint8), 1)
+    counts = np.zeros((height, width), np.uint8)
+    for i in range(3):
+        for j in range(3):
+            if (i, j) != (1, 1):
+                counts += padded[i : i + height, j : j + width]
+    return counts
+
 
 class Minesweeper:
     """
     Minesweeper game representation
+
+    The board is a boolean array, and the number of mines
+    around every cell is computed once, when mines are placed.
     """
 
-    def __init__(self, height=8, width=8, mines=8):
+    def __init__(self, height=8, width=8, mines=8, seed=None):
         # Set initial width, height, and number of mines
         self.height = height
         self.width = width
-        self.mines = set()
 
-        # Initialize an empty field with no mines
-        self.board = []
-        for i in range(self.height):
-            row = []
-            for j in range(self.width):
-                row.append(False)
-            self.board.append(row)
-
-        # Add mines randomly
-        while len(self.mines) != mines:
-            i = random.randrange(height)
-            j = random.randrange(width)
-            if not self.board[i][j]:
-                self.mines.add((i, j))
-                self.board[i][j] = True
+        # Add mines randomly, drawing distinct cells at once
+        rng = random if seed is None else random.Random(seed)
+        positions = rng.sample(range(height * width), mines)
+        self.mines = {divmod(position, width) for position in positions}
+        self.board = np.zeros((height, width), bool)
+        self.board.flat[positions] = True
+
+        # Mines around every cell, and the safe cells with none around
+        self.counts = neighbor_counts(self.board)
+        self.empty = (self.counts == 0) & ~self.board
+
+        # For reveal, cells are numbered on the board with a border around
+        # it, which counts as seen already, so neighbors need no bounds
+        self.padded_empty = np.pad(self.empty, 1).ravel()
+        self.seen = np.pad(np.zeros_like(self.empty), 1, constant_values=True).ravel()
+        self.offsets = np.array(
+            [di * (width + 2) + dj for di in (-1, 0, 1) for dj in (-1, 0, 1)]
+        )
 
         # At first, player has found no mines
         self.mines_found = set()
@@ -49,7 +72,7 @@ class Minesweeper:
 
     def is_mine(self, cell):
         i, j = cell
-        return self.board[i][j]
+        return bool(self.board[i, j])
 
     def nearby_mines(self, cell):
         """
@@ -57,23 +80,47 @@ class Minesweeper:
         within one row and column of a given cell,
         not including the cell itself.
         """
+        i, j = cell
+        return int(self.counts[i, j])
 
-        # Keep count of nearby mines
-        count = 0
-
-        # Loop over all cells within one row and column
-        for i in range(cell[0] - 1, cell[0] + 2):
-            for j in range(cell[1] - 1, cell[1] + 2):
-                # Ignore the cell itself
-                if (i, j) == cell:
-                    continue
-
-                # Update count if cell in bounds and is mine
-                if 0 <= i < self.height and 0 <= j < self.width:
-                    if self.board[i][j]:
-                        count += 1
+    def reveal(self, cell):
+        """
+        Returns the cells revealed by clicking a safe cell: the cell
+        itself, or if no mine is near it, the whole region of such
+        cells around it together with their neighbors.
 
-        return count
+        The region is searched breadth first, one frontier of cells at
+        a time, so the work grows with the cells revealed and not with
+        the size of the board.
+        """
+        i, j = cell
+        if not self.empty[i, j]:
+            return [cell]
+
+        # Position of each cell among the cells found in a step, so a cell
+        # found more than once is kept once
+        positions = np.empty(self.seen.size, np.intp)
+
+        width = self.width + 2
+        frontier = np.array([(i + 1) * width + j + 1])
+        self.seen[frontier] = True
+        opened = [frontier]
+        while frontier.size:
+            # Neighbors of the frontier's empty cells not seen yet
+            found = (frontier[:, None] + self.offsets).ravel()
+            found = found[~self.seen[found]]
+            order = np.arange(found.size)
+            positions[found] = order
+            found = found[positions[found] == order]
+            self.seen[found] = True
+            opened.append(found)
+            frontier = found[self.padded_empty[found]]
+
+        # Only the cells opened are cleared, for the next reveal
+        opened = np.sort(np.concatenate(opened))
+        self.seen[opened] = False
+        rows, columns = np.divmod(opened, width)
+        return list(zip((rows - 1).tolist(), (columns - 1).tolist()))
 
     def won(self):
         """
@@ -96,6 +143,11 @@ class Sentence:
     def __eq__(self, other):
         return self.cells == other.cells and self.count == other.count
 
+    def __hash__(self):
+        # Marking a cell changes the hash, so a sentence must be taken out
+        # of any set or dict before it is marked, and put back after
+        return hash((frozenset(self.cells), self.count))
+
     def __str__(self):
         return f"{self.cells} = {self.count}"
 
@@ -121,15 +173,172 @@ class Sentence:
             self.cells.remove(cell)
 
 
+def mine_symbol(cell):
+    """
+    Returns the name of the symbol for "cell is a mine".
+    """
+    return f"Mine{cell[0]},{cell[1]}"
+
+
+class Bound:
+    """
+    Constraint that between low and high of a set of cells are
+    mines, told to the SAT solver's knowledge base, which builds
+    it as a cardinality constraint over one symbol per cell.
+    """
+
+    def __init__(self, cells, low, high):
+        self.cells = sorted(cells)
+        self.low = low
+        self.high = high
+
+    def symbols(self):
+        return {mine_symbol(cell) for cell in self.cells}
+
+    def fold(self, algebra):
+        literals = [algebra.symbol(mine_symbol(cell)) for cell in self.cells]
+        return algebra.cardinality(literals, self.low, self.high)
+
+
+def assignments(sentences):
+    """
+    Counts the ways to place mines in the cells of the given sentences
+    so that every sentence holds. Returns the cells, in the order they
+    were assigned, and a dict from each number of mines k to a pair
+    (ways, mines): the number of placements with k mines, and for each
+    cell the number of those in which it is a mine.
+
+    Cells are assigned one at a time in breadth-first order, so only a
+    few sentences are partly assigned at any point. Placements that leave
+    every sentence needing the same number of mines have the same
+    completions, so they are merged and carried on together.
+    """
+    sentences = list(sentences)
+    containing = {}
+    for index, sentence in enumerate(sentences):
+        for cell in sentence.cells:
+            containing.setdefault(cell, []).append(index)
+
+    start = min(containing)
+    cells = [start]
+    seen = {start}
+    for cell in cells:
+        for index in containing[cell]:
+            for other in sorted(sentences[index].cells - seen):
+                seen.add(other)
+                cells.append(other)
+
+    # Cells of each sentence still unassigned
+    remaining = [len(sentence.cells) for sentence in sentences]
+
+    # Mines still needed by every sentence, and mines placed so far
+    states = {(tuple(sentence.count for sentence in sentences), 0): (1, [])}
+    for cell in cells:
+        touched = containing[cell]
+        for index in touched:
+            remaining[index] -= 1
+        next_states = {}
+        for (needs, k), (ways, mines) in states.items():
+            for mine in (0, 1):
+                updated = list(needs)
+                for index in touched:
+                    updated[index] -= mine
+                    if not 0 <= updated[index] <= remaining[index]:
+                        break
+                else:
+                    key = (tuple(updated), k + mine)
+                    counted = mines + [ways * mine]
+                    if key in next_states:
+                        other_ways, other_mines = next_states[key]
+                        next_states[key] = (
+                            ways + other_ways,
+                            [a + b for a, b in zip(counted, other_mines)],
+                        )
+                    else:
+                        next_states[key] = (ways, counted)
+        states = next_states
+
+    # Every sentence is satisfied now, so the needs are all zero
+    return cells, {k: value for (_, k), value in states.items()}
+
+
+def signature(sentences):
+    """
+    Returns a key for a group of sentences that stays
+    the same while the sentences in it do not change.
+    """
+    return frozenset(
+        (frozenset(sentence.cells), sentence.count) for sentence in sentences
+    )
+
+
+def convolve(first, second):
+    """
+    Returns the distribution of the total number of mines
+    of two independent distributions, as lists indexed by it.
+    """
+    if not first or not second:
+        return []
+    total = [0.0] * (len(first) + len(second) - 1)
+    for i, a in enumerate(first):
+        if a:
+            for j, b in enumerate(second):
+                total[i + j] += a * b
+    return total
+
+
+class CellPool:
+    """
+    Set of cells that can add, remove and choose a
+    random cell in constant time. Cells are kept in a list,
+    and a removed cell's place is taken by the last one.
+    """
+
+    def __init__(self, cells=()):
+        self.cells = list(cells)
+        self.positions = dict(zip(self.cells, range(len(self.cells))))
+
+    def __len__(self):
+        return len(self.cells)
+
+    def __contains__(self, cell):
+        return cell in self.positions
+
+    def __iter__(self):
+        return iter(self.cells)
+
+    def add(self, cell):
+        if cell not in self.positions:
+            self.positions[cell] = len(self.cells)
+            self.cells.append(cell)
+
+    def discard(self, cell):
+        position = self.positions.pop(cell, None)
+        if position is None:
+            return
+        last = self.cells.pop()
+        if position < len(self.cells):
+            self.cells[position] = last
+            self.positions[last] = position
+
+    def choice(self):
+        return random.choice(self.cells)
+
+
 class MinesweeperAI:
     """
     Minesweeper game player
     """
 
-    def __init__(self, height=8, width=8):
-        # Set initial height and width
+    def __init__(self, height=8, width=8, mines=8, solver=False):
+        # Set initial height and width, and the number of mines
         self.height = height
         self.width = width
+        self.mine_count = mines
+
+        # Whether to find every forced cell with the SAT solver,
+        # after the subset rule has found what it can
+        self.solver = solver
 
         # Keep track of which cells have been clicked on
         self.moves_made = set()
@@ -138,26 +347,134 @@ class MinesweeperAI:
         self.mines = set()
         self.safes = set()
 
-        # List of sentences about the game known to be true
-        self.knowledge: list[Sentence] = []
+        # Safe cells not clicked on yet, and cells not known either way
+        self.safe_moves = CellPool()
+        self.unknown = CellPool(itertools.product(range(height), range(width)))
+
+        # Set of sentences about the game known to be true
+        self.knowledge: set[Sentence] = set()
+
+        # Sentences containing each cell, so marking a cell
+        # only touches the sentences it appears in
+        self.index: dict[tuple, set[Sentence]] = {}
+
+        # Sentences added or changed since inference last looked at them
+        self.pending: list[Sentence] = []
+
+        # Mine placements of the components last solved, kept
+        # for the components still unchanged at the next call
+        self.solutions = {}
+
+        # Cells the solver found forced in each component, kept likewise
+        self.deductions = {}
+
+    def tell(self, sentence):
+        """
+        Adds a sentence to the knowledge base, unless it is
+        empty or already known, and queues it for inference.
+        """
+        if not sentence.cells or sentence in self.knowledge:
+            return
+        self.knowledge.add(sentence)
+        for cell in sentence.cells:
+            self.index.setdefault(cell, set()).add(sentence)
+        self.pending.append(sentence)
+
+    def retract(self, sentence):
+        """
+        Removes a sentence from the knowledge base.
+        """
+        self.knowledge.discard(sentence)
+        for cell in sentence.cells:
+            sentences = self.index.get(cell)
+            if sentences is not None:
+                sentences.discard(sentence)
+                if not sentences:
+                    del self.index[cell]
 
     def mark_mine(self, cell):
         """
         Marks a cell as a mine, and updates all knowledge
         to mark that cell as a mine as well.
         """
+        if cell in self.mines:
+            return
         self.mines.add(cell)
-        for sentence in self.knowledge:
+        self.unknown.discard(cell)
+        for sentence in list(self.index.get(cell, ())):
+            self.retract(sentence)
             sentence.mark_mine(cell)
+            self.tell(sentence)
 
     def mark_safe(self, cell):
         """
         Marks a cell as safe, and updates all knowledge
         to mark that cell as safe as well.
         """
+        if cell in self.safes:
+            return
         self.safes.add(cell)
-        for sentence in self.knowledge:
+        self.unknown.discard(cell)
+        if cell not in self.moves_made:
+            self.safe_moves.add(cell)
+        for sentence in list(self.index.get(cell, ())):
+            self.retract(sentence)
             sentence.mark_safe(cell)
+            self.tell(sentence)
+
+    def neighbors(self, cell):
+        """
+        Returns the cells within one row and column
+        of a given cell, not including the cell itself.
+        """
+        i, j = cell
+        return {
+            (row, column)
+            for row in range(max(i - 1, 0), min(i + 2, self.height))
+            for column in range(max(j - 1, 0), min(j + 2, self.width))
+            if (row, column) != cell
+        }
+
+    def infer(self):
+        """
+        Draws conclusions from the pending sentences until none are left.
+
+        A sentence whose cells are all mines or all safe is resolved by
+        marking them. Otherwise it is compared with the sentences that
+        share a cell with it, the only ones that can be its subsets or
+        supersets, and the difference of every such pair is added.
+        """
+        while self.pending:
+            sentence = self.pending.pop()
+            if sentence not in self.knowledge:
+                continue
+
+            mines = sentence.known_mines()
+            safes = sentence.known_safes()
+            if mines or safes:
+                for cell in mines:
+                    self.mark_mine(cell)
+                for cell in safes:
+                    self.mark_safe(cell)
+                continue
+
+            related = set()
+            for cell in sentence.cells:
+                related |= self.index[cell]
+            related.discard(sentence)
+            for other in related:
+                if sentence.cells < other.cells:
+                    self.tell(
+                        Sentence(
+                            other.cells - sentence.cells, other.count - sentence.count
+                        )
+                    )
+                elif other.cells < sentence.cells:
+                    self.tell(
+                        Sentence(
+                            sentence.cells - other.cells, sentence.count - other.count
+                        )
+                    )
 
     def add_knowledge(self, cell, count):
         """
@@ -174,14 +491,248 @@ class MinesweeperAI:
             5) add any new sentences to the AI's knowledge base
                if they can be inferred from existing knowledge
         """
-
-        # self.safes.add(cell)
-        # self.moves_made.add(cell)
-        #
-        # continue_loop = True
-        # while continue_loop:
-
-        raise NotImplementedError
+        self.moves_made.add(cell)
+        self.safe_moves.discard(cell)
+        self.mark_safe(cell)
+
+        # Leave out neighbors already known, counting off known mines
+        cells = set()
+        for neighbor in self.neighbors(cell):
+            if neighbor in self.mines:
+                count -= 1
+            elif neighbor not in self.safes:
+                cells.add(neighbor)
+
+        self.tell(Sentence(cells, count))
+        self.infer()
+        if self.solver:
+            while self.solve():
+                self.infer()
+
+    def components(self):
+        """
+        Splits the knowledge into groups of sentences
+        such that no two groups share a cell.
+        """
+        groups = []
+        seen = set()
+        for sentence in self.knowledge:
+            if sentence in seen:
+                continue
+            seen.add(sentence)
+            group = [sentence]
+            for member in group:
+                for cell in member.cells:
+                    for other in self.index[cell]:
+                        if other not in seen:
+                            seen.add(other)
+                            group.append(other)
+            groups.append(group)
+        return groups
+
+    def deduce(self, sentences, mines=None, others=0):
+        """
+        Returns the cells of the given sentences that must be mines, and
+        those that must be safe, for every sentence to hold. If a number
+        of mines is given, the cells and the others unknown cells outside
+        them hold that many mines between them. Also returns True if the
+        cells outside must all be mines, False if they must all be safe,
+        and None otherwise.
+
+        Every sentence becomes a Bound on its cells, and the bounds are
+        told to a SAT knowledge base, which is then asked about every
+        cell. The cells outside are interchangeable, so they are left
+        out, and the mines in the sentences' cells are bounded instead.
+        """
+        # Only the solver mode needs the SAT solver
+        import sat
+
+        cells = sorted(set().union(*[sentence.cells for sentence in sentences]))
+        knowledge = sat.KnowledgeBase(
+            *[
+                Bound(sentence.cells, sentence.count, sentence.count)
+                for sentence in sentences
+            ]
+        )
+        outside = None
+        if mines is not None:
+            # The cells hold at most the mines left, and at least
+            # what the cells outside cannot take
+            low = max(mines - others, 0)
+            high = min(mines, len(cells))
+            if low > high:
+                return set(), set(), None
+            if cells and (low, high) != (0, len(cells)):
+                knowledge.tell(Bound(cells, low, high))
+            # The cells outside are all mines if the cells cannot hold more
+            # than they leave over, and all safe if they hold every mine
+            if others and knowledge.consistent():
+                if mines >= others and knowledge.ask(Bound(cells, 0, mines - others)):
+                    outside = True
+                elif mines <= len(cells) and knowledge.ask(
+                    Bound(cells, mines, len(cells))
+                ):
+                    outside = False
+        if not knowledge.consistent():
+            return set(), set(), None
+
+        report = knowledge.report([mine_symbol(cell) for cell in cells])
+        return (
+            {cell for cell in cells if report[mine_symbol(cell)] == "YES"},
+            {cell for cell in cells if report[mine_symbol(cell)] == "NO"},
+            outside,
+        )
+
+    def solve(self):
+        """
+        Marks every cell that the knowledge and the number of mines
+        left force to be a mine or safe, and returns whether any cell
+        was marked.
+
+        Components of the knowledge are solved on their own, and the
+        cells found for one are kept until it changes. That is exact
+        while the count cannot matter: while the fewest mines the
+        components can hold leave fewer mines than there are unknown
+        cells outside them, and the most they can hold are fewer than
+        the mines left. Otherwise the count ties the components together
+        into one, and can also decide the cells outside.
+        """
+        groups = self.components()
+        fewest = most = 0
+        frontier = set()
+        for cells, placements in self.placements(groups):
+            fewest += min(placements, default=0)
+            most += max(placements, default=0)
+            frontier.update(cells)
+        mines_left = self.mine_count - len(self.mines)
+        others = len(self.unknown) - len(frontier)
+        if mines_left - others < fewest and most < mines_left:
+            mines_left, others = None, 0
+        else:
+            groups = [[sentence for group in groups for sentence in group]]
+
+        deductions = {}
+        mines = set()
+        safes = set()
+        outside = None
+        for group in groups:
+            key = (signature(group), mines_left, others)
+            found = self.deductions.get(key)
+            if found is None:
+                found = self.deduce(group, mines_left, others)
+            deductions[key] = found
+            mines |= found[0]
+            safes |= found[1]
+            outside = found[2]
+        self.deductions = deductions
+
+        if outside is not None:
+            cells = {cell for cell in self.unknown if cell not in frontier}
+            (mines if outside else safes).update(cells)
+        for cell in mines:
+            self.mark_mine(cell)
+        for cell in safes:
+            self.mark_safe(cell)
+        return bool(mines or safes)
+
+    def placements(self, groups):
+        """
+        Returns the placements of mines in every group of sentences, see
+        assignments(), reusing those of the groups that are unchanged
+        since the last call.
+        """
+        solutions = {}
+        found = []
+        for group in groups:
+            key = signature(group)
+            solution = self.solutions.get(key) or assignments(group)
+            solutions[key] = solution
+            found.append(solution)
+        self.solutions = solutions
+        return found
+
+    def mine_probabilities(self):
+        """
+        Returns the probability that each unknown cell in the knowledge
+        is a mine, and the probability for any other unknown cell, or
+        None if there is none.
+
+        Every component of the knowledge is solved on its own. The
+        components are then combined with the number of mines left: a
+        total of K mines in the components leaves the others to be spread
+        over the remaining unknown cells in C(others, mines left - K)
+        ways. Weights are scaled and binomials taken as logarithms, so
+        large boards do not overflow.
+        """
+        unknown = len(self.unknown)
+        mines_left = self.mine_count - len(self.mines)
+
+        components = self.placements(self.components())
+
+        # Scaled number of placements by mines in each component
+        distributions = []
+        for cells, placements in components:
+            scale = max([ways for ways, _ in placements.values()], default=1)
+            distribution = [0.0] * (max(placements, default=0) + 1)
+            for k, (ways, _) in placements.items():
+                distribution[k] = ways / scale
+            distributions.append(distribution)
+
+        frontier = sum(len(cells) for cells, _ in components)
+        others = unknown - frontier
+
+        def log_weight(k):
+            spread = mines_left - k
+            if not 0 <= spread <= others:
+                return None
+            return (
+                math.lgamma(others + 1)
+                - math.lgamma(spread + 1)
+                - math.lgamma(others - spread + 1)
+            )
+
+        logs = [log_weight(k) for k in range(frontier + 1)]
+        top = max([log for log in logs if log is not None], default=0.0)
+        weights = [0.0 if log is None else math.exp(log - top) for log in logs]
+
+        # Distributions of all components before and after each one
+        prefixes = [[1.0]]
+        for distribution in distributions:
+            prefixes.append(convolve(prefixes[-1], distribution))
+        suffixes = [[1.0]]
+        for distribution in reversed(distributions):
+            suffixes.append(convolve(suffixes[-1], distribution))
+        suffixes.reverse()
+
+        total = sum(count * weights[k] for k, count in enumerate(prefixes[-1]) if count)
+        if not total:
+            # The knowledge does not fit the mine count, so guess uniformly
+            uniform = mines_left / unknown if unknown else 0.0
+            probabilities = {cell: uniform for cells, _ in components for cell in cells}
+            return probabilities, uniform if others else None
+
+        probabilities = {}
+        for index, (cells, placements) in enumerate(components):
+            rest = convolve(prefixes[index], suffixes[index + 1])
+            scale = max(ways for ways, _ in placements.values())
+            mines = [0.0] * len(cells)
+            for k, (_, counts) in placements.items():
+                weight = sum(
+                    count * weights[k + j] for j, count in enumerate(rest) if count
+                )
+                for i, count in enumerate(counts):
+                    mines[i] += count / scale * weight
+            for cell, mine in zip(cells, mines):
+                probabilities[cell] = mine / total
+
+        if not others:
+            return probabilities, None
+        expected = sum(
+            count * weights[k] * (mines_left - k)
+            for k, count in enumerate(prefixes[-1])
+            if count
+        )
+        return probabilities, expected / total / others
 
     def make_safe_move(self):
         """
@@ -193,19 +744,29 @@ class MinesweeperAI:
         and self.moves_made, but should not modify any of those values.
         """
 
-        return (self.safes - self.moves_made).pop()
+        return self.safe_moves.choice() if self.safe_moves else None
 
     def make_random_move(self):
         """
         Returns a move to make on the Minesweeper board.
-        Should choose randomly among cells that:
+        Should choose among cells that:
             1) have not already been chosen, and
             2) are not known to be mines
+        picking the cell least likely to be a mine, and
+        randomly among the cells no sentence mentions.
         """
 
-        impossible_moves = set(self.moves_made | self.mines)
-
-        for i in range(self.height):
-            for j in range(self.width):
-                if (i, j) not in impossible_moves:
-                    return (i, j)
+        move = self.make_safe_move()
+        if move is not None:
+            return move
+
+        probabilities, other = self.mine_probabilities()
+        move = min(probabilities, key=probabilities.get, default=None)
+        if other is not None and (move is None or other < probabilities[move]):
+            # Some unknown cell is in no sentence, so drawing
+            # until one is found ends, usually on the first draw
+            while True:
+                move = self.unknown.choice()
+                if move not in probabilities:
+                    return move
+        return move
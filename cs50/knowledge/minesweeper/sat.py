@@ -0,0 +1,520 @@
+"""
+Conflict-driven clause learning (CDCL) backend for the logic modules.
+
+Sentences are turned into clauses with a Tseitin encoding: every connective
+gets a fresh variable constrained to be equivalent to it, so the number of
+clauses stays linear in the size of the sentence. Entailment KB |= query is
+decided as unsatisfiability of KB ∧ ¬query. Cardinality constraints use a
+sequential counter, which takes O(n·k) clauses instead of the O(n²) of
+pairwise exclusions.
+"""
+
+import heapq
+
+
+class CNF:
+    """
+    Clause database built from sentences.
+
+    Implements the algebra used by `Sentence.fold`, where every
+    subsentence is interpreted as a literal: a positive or negative
+    variable number.
+    """
+
+    def __init__(self):
+        self.variables = {}
+        self.names = {}
+        self.num_variables = 0
+        self.clauses = []
+
+        # Gates already encoded, so equal subsentences share one variable
+        self.gates = {}
+
+    def variable(self, name):
+        """Returns the variable standing for the symbol called name."""
+        if name not in self.variables:
+            self.num_variables += 1
+            self.variables[name] = self.num_variables
+            self.names[self.num_variables] = name
+        return self.variables[name]
+
+    def fresh(self):
+        """Returns a new auxiliary variable."""
+        self.num_variables += 1
+        return self.num_variables
+
+    def add_clause(self, clause):
+        self.clauses.append(list(clause))
+
+    def encode(self, sentence):
+        """Returns a literal equivalent to sentence."""
+        return sentence.fold(self)
+
+    def require(self, sentence):
+        """Adds clauses asserting that sentence is true."""
+        self.add_clause([self.encode(sentence)])
+
+    def symbol(self, name):
+        return self.variable(name)
+
+    def negation(self, literal):
+        return -literal
+
+    def conjunction(self, literals):
+        literals = tuple(sorted(set(literals)))
+        if len(literals) == 1:
+            return literals[0]
+        key = ("and", literals)
+        if key not in self.gates:
+            gate = self.fresh()
+            for literal in literals:
+                self.add_clause([-gate, literal])
+            self.add_clause([gate] + [-literal for literal in literals])
+            self.gates[key] = gate
+        return self.gates[key]
+
+    def disjunction(self, literals):
+        return -self.conjunction([-literal for literal in literals])
+
+    def implication(self, antecedent, consequent):
+        return self.disjunction([-antecedent, consequent])
+
+    def biconditional(self, left, right):
+        key = ("iff", tuple(sorted((left, right))))
+        if key not in self.gates:
+            gate = self.fresh()
+            self.add_clause([-gate, -left, right])
+            self.add_clause([-gate, left, -right])
+            self.add_clause([gate, left, right])
+            self.add_clause([gate, -left, -right])
+            self.gates[key] = gate
+        return self.gates[key]
+
+    def cardinality(self, literals, low, high):
+        return sequential_counter(self, literals, low, high)
+
+
+def sequential_counter(algebra, values, low, high):
+    """
+    Returns the value of "between low and high of values are true" in
+    algebra, built from its conjunction and disjunction only.
+
+    Values are counted one by one: after each, counts[j] stands for "at
+    least j + 1 values so far are true", kept up to the first count that
+    decides the constraint, so the encoding has O(n·k) connectives.
+    """
+    if low > len(values):
+        return algebra.disjunction([])
+    high = min(high, len(values))
+    bound = max(low, high + 1) if high < len(values) else low
+
+    counts = []
+    for value in values:
+        updated = []
+        for j in range(min(len(counts) + 1, bound)):
+            if j == 0:
+                carried = value
+            else:
+                carried = algebra.conjunction([counts[j - 1], value])
+            if j < len(counts):
+                carried = algebra.disjunction([counts[j], carried])
+            updated.append(carried)
+        counts = updated
+
+    conditions = []
+    if low > 0:
+        conditions.append(counts[low - 1])
+    if high < len(values):
+        conditions.append(algebra.negation(counts[high]))
+    return algebra.conjunction(conditions)
+
+
+def luby(index):
+    """Returns the index-th element (from 0) of the Luby restart sequence."""
+    size, exponent = 1, 0
+    while size < index + 1:
+        exponent += 1
+        size = 2 * size + 1
+    while size - 1 != index:
+        size = (size - 1) >> 1
+        exponent -= 1
+        index = index % size
+    return 2**exponent
+
+
+class Solver:
+    """
+    CDCL SAT solver over integer literals.
+
+    Uses two watched literals for unit propagation, first-UIP conflict
+    analysis, VSIDS-style variable activities with phase saving, Luby
+    restarts and periodic deletion of long learnt clauses.
+    """
+
+    RESTART_BASE = 100
+    DECAY = 0.95
+
+    def __init__(self, num_variables=0, clauses=()):
+        # Per-variable state, indexed by variable number
+        self.assigns = [0]
+        self.level = [0]
+        self.reason = [None]
+        self.activity = [0.0]
+        self.phase = [False]
+
+        # Clauses watching a literal, visited when that literal becomes false
+        self.watches = {}
+
+        self.trail = []
+        self.trail_limits = []
+        self.head = 0
+
+        self.heap = []
+        self.increment = 1.0
+        self.learnts = []
+        self.max_learnts = 1000
+        self.model = None
+        self.ok = True
+
+        self.ensure(num_variables)
+        for clause in clauses:
+            self.add_clause(clause)
+
+    @property
+    def num_variables(self):
+        return len(self.assigns) - 1
+
+    def ensure(self, num_variables):
+        """Makes room for variables up to num_variables."""
+        for var in range(self.num_variables + 1, num_variables + 1):
+            self.assigns.append(0)
+            self.level.append(0)
+            self.reason.append(None)
+            self.activity.append(0.0)
+            self.phase.append(False)
+            heapq.heappush(self.heap, (0.0, var))
+
+    def truth(self, literal):
+        """Returns 1, -1 or 0 for a true, false or unassigned literal."""
+        if literal > 0:
+            return self.assigns[literal]
+        return -self.assigns[-literal]
+
+    def add_clause(self, clause):
+        """Adds a clause, returning False once the clauses are unsatisfiable."""
+        if not self.ok:
+            return False
+        self.backtrack(0)
+        literals = set(clause)
+        if any(-literal in literals for literal in literals):
+            return True
+        self.ensure(max((abs(literal) for literal in literals), default=0))
+        if any(self.truth(literal) == 1 for literal in literals):
+            return True
+        literals = [literal for literal in literals if self.truth(literal) == 0]
+
+        if not literals:
+            self.ok = False
+        elif len(literals) == 1:
+            self.enqueue(literals[0], None)
+            self.ok = self.propagate() is None
+        else:
+            self.watch(literals)
+        return self.ok
+
+    def watch(self, clause):
+        self.watches.setdefault(clause[0], []).append(clause)
+        self.watches.setdefault(clause[1], []).append(clause)
+
+    def enqueue(self, literal, reason):
+        var = abs(literal)
+        self.assigns[var] = 1 if literal > 0 else -1
+        self.level[var] = len(self.trail_limits)
+        self.reason[var] = reason
+        self.trail.append(literal)
+
+    def propagate(self):
+        """Propagates unit clauses, returning a conflicting clause or None."""
+        assigns = self.assigns
+        while self.head < len(self.trail):
+            false_literal = -self.trail[self.head]
+            self.head += 1
+            watchers = self.watches.get(false_literal)
+            if not watchers:
+                continue
+
+            kept = []
+            for position, clause in enumerate(watchers):
+                # Keep the literal that just became false in slot 1
+                if clause[0] == false_literal:
+                    clause[0], clause[1] = clause[1], false_literal
+                first = clause[0]
+                first_value = assigns[first] if first > 0 else -assigns[-first]
+                if first_value == 1:
+                    kept.append(clause)
+                    continue
+
+                # Look for another literal that is not false to watch
+                for k in range(2, len(clause)):
+                    literal = clause[k]
+                    if (assigns[literal] if literal > 0 else -assigns[-literal]) != -1:
+                        clause[1], clause[k] = literal, false_literal
+                        self.watches.setdefault(literal, []).append(clause)
+                        break
+                else:
+                    kept.append(clause)
+                    if first_value == -1:
+                        kept.extend(watchers[position + 1 :])
+                        self.watches[false_literal] = kept
+                        return clause
+                    self.enqueue(first, clause)
+            self.watches[false_literal] = kept
+        return None
+
+    def analyze(self, conflict):
+        """Derives a first-UIP learnt clause and the level to backjump to."""
+        seen = set()
+        learnt = [0]
+        level = len(self.trail_limits)
+        pending = 0
+        index = len(self.trail) - 1
+        clause = conflict
+
+        while True:
+            for literal in clause:
+                var = abs(literal)
+                if var not in seen and self.level[var] > 0:
+                    seen.add(var)
+                    self.bump(var)
+                    if self.level[var] == level:
+                        pending += 1
+                    else:
+                        learnt.append(literal)
+
+            # Resolve with the reason of the latest seen literal on the trail
+            while abs(self.trail[index]) not in seen:
+                index -= 1
+            literal = self.trail[index]
+            index -= 1
+            pending -= 1
+            if pending == 0:
+                break
+            clause = self.reason[abs(literal)]
+
+        learnt[0] = -literal
+        if len(learnt) == 1:
+            return learnt, 0
+
+        # The second watch must be the literal assigned at the highest level
+        deepest = max(range(1, len(learnt)), key=lambda i: self.level[abs(learnt[i])])
+        learnt[1], learnt[deepest] = learnt[deepest], learnt[1]
+        return learnt, self.level[abs(learnt[1])]
+
+    def bump(self, var):
+        self.activity[var] += self.increment
+        if self.activity[var] > 1e100:
+            self.activity = [activity * 1e-100 for activity in self.activity]
+            self.increment *= 1e-100
+            self.heap = [
+                (-self.activity[v], v)
+                for v in range(1, len(self.assigns))
+                if self.assigns[v] == 0
+            ]
+            heapq.heapify(self.heap)
+        if self.assigns[var] == 0:
+            heapq.heappush(self.heap, (-self.activity[var], var))
+
+    def backtrack(self, level):
+        if len(self.trail_limits) <= level:
+            return
+        limit = self.trail_limits[level]
+        for literal in self.trail[limit:]:
+            var = abs(literal)
+            self.phase[var] = literal > 0
+            self.assigns[var] = 0
+            self.reason[var] = None
+            heapq.heappush(self.heap, (-self.activity[var], var))
+        del self.trail[limit:]
+        del self.trail_limits[level:]
+        self.head = limit
+
+    def pick(self):
+        """Returns the unassigned variable with the highest activity."""
+        while self.heap:
+            _, var = heapq.heappop(self.heap)
+            if self.assigns[var] == 0:
+                return var
+        return None
+
+    def reduce(self):
+        """Forgets the longer half of the learnt clauses not used as reasons."""
+        locked = {id(self.reason[abs(clause[0])]) for clause in self.learnts}
+        self.learnts.sort(key=len)
+        middle = len(self.learnts) // 2
+        removed = {
+            id(clause) for clause in self.learnts[middle:] if id(clause) not in locked
+        }
+        self.learnts = [clause for clause in self.learnts if id(clause) not in removed]
+        for literal, watchers in self.watches.items():
+            self.watches[literal] = [
+                clause for clause in watchers if id(clause) not in removed
+            ]
+        self.max_learnts = int(self.max_learnts * 1.1)
+
+    def solve(self, assumptions=()):
+        """
+        Searches for a satisfying assignment in which every literal in
+        assumptions is true. Learnt clauses are kept between calls.
+        """
+        self.model = None
+        if not self.ok:
+            return False
+        self.backtrack(0)
+        self.ensure(max((abs(literal) for literal in assumptions), default=0))
+
+        restarts = 0
+        conflicts = 0
+        limit = luby(restarts) * self.RESTART_BASE
+        while True:
+            conflict = self.propagate()
+            if conflict is not None:
+                if not self.trail_limits:
+                    self.ok = False
+                    return False
+                learnt, level = self.analyze(conflict)
+                self.backtrack(level)
+                if len(learnt) == 1:
+                    self.enqueue(learnt[0], None)
+                else:
+                    self.watch(learnt)
+                    self.learnts.append(learnt)
+                    self.enqueue(learnt[0], learnt)
+                self.increment /= self.DECAY
+                conflicts += 1
+                continue
+
+            if conflicts >= limit:
+                restarts += 1
+                conflicts = 0
+                limit = luby(restarts) * self.RESTART_BASE
+                self.backtrack(0)
+                continue
+            if len(self.learnts) - len(self.trail) >= self.max_learnts:
+                self.reduce()
+
+            # Assumptions are decided first, one per decision level
+            level = len(self.trail_limits)
+            if level < len(assumptions):
+                literal = assumptions[level]
+                truth = self.truth(literal)
+                if truth == -1:
+                    self.backtrack(0)
+                    return False
+                self.trail_limits.append(len(self.trail))
+                if truth == 0:
+                    self.enqueue(literal, None)
+                continue
+
+            var = self.pick()
+            if var is None:
+                self.model = [assign > 0 for assign in self.assigns]
+                self.backtrack(0)
+                return True
+            self.trail_limits.append(len(self.trail))
+            self.enqueue(var if self.phase[var] else -var, None)
+
+
+def satisfiable(sentence):
+    """Returns a model of sentence as a dict of symbol names, or None."""
+    cnf = CNF()
+    cnf.require(sentence)
+    solver = Solver(cnf.num_variables, cnf.clauses)
+    if not solver.solve():
+        return None
+    return {name: solver.model[var] for name, var in cnf.variables.items()}
+
+
+def entails(knowledge, query):
+    """Checks if knowledge entails query by refuting knowledge ∧ ¬query."""
+    cnf = CNF()
+    cnf.require(knowledge)
+    cnf.add_clause([-cnf.encode(query)])
+    return not Solver(cnf.num_variables, cnf.clauses).solve()
+
+
+class KnowledgeBase:
+    """
+    Knowledge base that is told sentences incrementally and asked queries.
+
+    Every sentence is encoded into one persistent solver. A query is
+    answered by solving under the assumption that it is false, so clauses
+    learnt and facts fixed while answering one query are reused by later
+    queries and later tells.
+    """
+
+    def __init__(self, *sentences):
+        self.cnf = CNF()
+        self.solver = Solver()
+        self.symbols = set()
+        for sentence in sentences:
+            self.tell(sentence)
+
+    def flush(self):
+        """Moves newly encoded clauses into the solver."""
+        self.solver.ensure(self.cnf.num_variables)
+        for clause in self.cnf.clauses:
+            self.solver.add_clause(clause)
+        self.cnf.clauses.clear()
+
+    def tell(self, sentence):
+        """Adds sentence to the knowledge base."""
+        self.symbols |= sentence.symbols()
+        self.cnf.require(sentence)
+        self.flush()
+
+    def ask(self, query):
+        """Checks if the knowledge base entails query."""
+        literal = self.cnf.encode(query)
+        self.flush()
+        return not self.solver.solve([-literal])
+
+    def consistent(self):
+        """Checks if the knowledge base has any model."""
+        return self.solver.solve()
+
+    def report(self, symbols=None):
+        """
+        Returns "YES", "NO" or "Maybe" for every symbol, depending on
+        whether the knowledge base entails it, its negation, or neither.
+        Models found along the way rule out answers without solving.
+        """
+        symbols = sorted(self.symbols if symbols is None else symbols)
+        variables = {name: self.cnf.variable(name) for name in symbols}
+        self.flush()
+        if not self.solver.solve():
+            return {name: "YES" for name in symbols}
+
+        can_be_true = set()
+        can_be_false = set()
+
+        def observe():
+            for name, var in variables.items():
+                if self.solver.model[var]:
+                    can_be_true.add(name)
+                else:
+                    can_be_false.add(name)
+
+        observe()
+        report = {}
+        for name, var in variables.items():
+            if name not in can_be_false and self.solver.solve([-var]):
+                observe()
+            if name not in can_be_true and self.solver.solve([var]):
+                observe()
+            if name not in can_be_false:
+                report[name] = "YES"
+            elif name not in can_be_true:
+                report[name] = "NO"
+            else:
+                report[name] = "Maybe"
+        return report
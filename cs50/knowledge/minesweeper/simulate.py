@@ -0,0 +1,190 @@
+"""
+Headless simulation of the Minesweeper AI.
+
+Plays many seeded games of `Minesweeper` against `MinesweeperAI` over a
+process pool, without a display. Every game is reproducible from its seed:
+the seed places the mines and also drives the AI's random choices. Moves
+are played as runner.py plays them, so a cell with no mines nearby opens
+its whole region and the AI is told about every cell revealed.
+
+For every game, the number of moves, the time spent choosing moves and
+adding knowledge, and the size of the knowledge base after each move are
+recorded. The summary gives the win rate, moves per second, inference
+time per move, and the mean knowledge base size by move number. Results
+are printed and written as JSON, so runs can be compared.
+
+    python simulate.py --games 1000 --height 16 --width 16 --mines 40
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from minesweeper import Minesweeper, MinesweeperAI
+
+
+def play(height, width, mines, seed, solver=False):
+    """Plays one game and returns its record."""
+    # The AI draws from its own stream, so its guesses do not follow the
+    # mine placement that was drawn from the same seed
+    random.seed(f"ai:{seed}")
+    game = Minesweeper(height=height, width=width, mines=mines, seed=seed)
+    ai = MinesweeperAI(height=height, width=width, mines=mines, solver=solver)
+
+    revealed = set()
+    moves = 0
+    inference = 0.0
+    knowledge_sizes = []
+    start = time.perf_counter()
+    won = False
+    while True:
+        started = time.perf_counter()
+        move = ai.make_safe_move()
+        if move is None:
+            move = ai.make_random_move()
+        inference += time.perf_counter() - started
+        if move is None or game.is_mine(move):
+            break
+
+        moves += 1
+        started = time.perf_counter()
+        for cell in game.reveal(move):
+            if cell not in revealed:
+                revealed.add(cell)
+                ai.add_knowledge(cell, game.nearby_mines(cell))
+        inference += time.perf_counter() - started
+        knowledge_sizes.append(len(ai.knowledge))
+
+        if len(revealed) == height * width - mines:
+            won = True
+            break
+
+    return {
+        "seed": seed,
+        "won": won,
+        "moves": moves,
+        "revealed": len(revealed),
+        "seconds": time.perf_counter() - start,
+        "inference_seconds": inference,
+        "knowledge_sizes": knowledge_sizes,
+    }
+
+
+def play_seeds(height, width, mines, seeds, solver=False):
+    return [play(height, width, mines, seed, solver) for seed in seeds]
+
+
+def simulate(height, width, mines, seeds, workers=None, chunk=16, solver=False):
+    """
+    Plays a game for every seed over a pool of worker processes, one per
+    CPU unless workers is given, and returns the records in seed order.
+    """
+    seeds = list(seeds)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        return play_seeds(height, width, mines, seeds, solver)
+    chunks = [seeds[i : i + chunk] for i in range(0, len(seeds), chunk)]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(play_seeds, height, width, mines, c, solver) for c in chunks
+        ]
+        return [game for future in futures for game in future.result()]
+
+
+def summarize(games):
+    moves = sum(game["moves"] for game in games)
+    seconds = sum(game["seconds"] for game in games)
+    inference = sum(game["inference_seconds"] for game in games)
+
+    # Mean size of the knowledge base after each move, over the games
+    # that lasted that long
+    totals = []
+    counts = []
+    for game in games:
+        for move, size in enumerate(game["knowledge_sizes"]):
+            if move == len(totals):
+                totals.append(0)
+                counts.append(0)
+            totals[move] += size
+            counts[move] += 1
+
+    return {
+        "games": len(games),
+        "wins": sum(game["won"] for game in games),
+        "win_rate": sum(game["won"] for game in games) / len(games) if games else 0,
+        "moves": moves,
+        "moves_per_second": moves / seconds if seconds else 0,
+        "inference_seconds_per_move": inference / moves if moves else 0,
+        "mean_knowledge_size": [total / count for total, count in zip(totals, counts)],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--height", type=int, default=8)
+    parser.add_argument("--width", type=int, default=8)
+    parser.add_argument("--mines", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first game")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument(
+        "--solver",
+        action="store_true",
+        help="find every forced cell with the SAT solver",
+    )
+    parser.add_argument("--output", default="simulation.json")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    games = simulate(
+        args.height,
+        args.width,
+        args.mines,
+        range(args.seed, args.seed + args.games),
+        args.workers,
+        solver=args.solver,
+    )
+    elapsed = time.perf_counter() - start
+    summary = summarize(games)
+
+    print(
+        f"{summary['games']} games on {args.height}x{args.width} "
+        f"with {args.mines} mines in {elapsed:.2f}s"
+    )
+    print(f"win rate:           {summary['win_rate']:.1%}")
+    print(f"moves per second:   {summary['moves_per_second']:.1f}")
+    print(f"inference per move: {summary['inference_seconds_per_move'] * 1000:.3f}ms")
+    sizes = summary["mean_knowledge_size"]
+    if sizes:
+        print(
+            f"knowledge size:     {max(sizes):.1f} at most, "
+            f"{sizes[-1]:.1f} after the last move"
+        )
+
+    with open(args.output, "w") as file:
+        json.dump(
+            {
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "board": {
+                    "height": args.height,
+                    "width": args.width,
+                    "mines": args.mines,
+                },
+                "solver": args.solver,
+                "seconds": elapsed,
+                "summary": summary,
+                "games": games,
+            },
+            file,
+            indent=2,
+        )
+
+
+if __name__ == "__main__":
+    main()
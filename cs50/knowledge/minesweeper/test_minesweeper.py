@@ -0,0 +1,96 @@
+import itertools
+import random
+
+from minesweeper import Minesweeper, MinesweeperAI
+
+
+def flood_fill(game, cell):
+    """Cells revealed by clicking cell, found one cell at a time."""
+    revealed = {cell}
+    queue = [cell]
+    for i, j in queue:
+        if game.nearby_mines((i, j)):
+            continue
+        for row in range(max(i - 1, 0), min(i + 2, game.height)):
+            for column in range(max(j - 1, 0), min(j + 2, game.width)):
+                if (row, column) not in revealed:
+                    revealed.add((row, column))
+                    queue.append((row, column))
+    return sorted(revealed)
+
+
+def test_reveal_matches_flood_fill():
+    rng = random.Random(0)
+    for seed in range(100):
+        height, width = rng.randint(1, 12), rng.randint(1, 12)
+        game = Minesweeper(height, width, rng.randint(0, height * width - 1), seed)
+        safes = [
+            (i, j) for i in range(height) for j in range(width) if not game.board[i, j]
+        ]
+        for cell in rng.sample(safes, min(len(safes), 10)):
+            assert game.reveal(cell) == flood_fill(game, cell)
+
+
+def placements(ai, height, width, mines):
+    """
+    The cells not known either way, and every placement of the mines
+    left among them that fits the AI's knowledge, by brute force.
+    """
+    unknown = [
+        (i, j)
+        for i in range(height)
+        for j in range(width)
+        if (i, j) not in ai.mines and (i, j) not in ai.safes
+    ]
+    found = []
+    for combination in itertools.combinations(unknown, mines - len(ai.mines)):
+        placed = set(combination)
+        if all(
+            len(placed & sentence.cells) == sentence.count for sentence in ai.knowledge
+        ):
+            found.append(placed)
+    return unknown, found
+
+
+def games(height, width, mines, count, solver=False):
+    """Yields the game and AI after every move of count games."""
+    for seed in range(count):
+        game = Minesweeper(height, width, mines, seed)
+        # The AI's moves are drawn apart from the mines
+        random.seed(count + seed)
+        ai = MinesweeperAI(height, width, mines, solver)
+        while True:
+            move = ai.make_safe_move() or ai.make_random_move()
+            if move is None or game.is_mine(move):
+                break
+            ai.add_knowledge(move, game.nearby_mines(move))
+            yield game, ai
+
+
+def test_ai_only_marks_what_is_true():
+    for game, ai in games(8, 8, 10, 50):
+        assert ai.mines <= game.mines
+        assert not ai.safes & game.mines
+        for sentence in ai.knowledge:
+            assert len(sentence.cells & game.mines) == sentence.count
+
+
+def test_solver_marks_every_forced_cell():
+    for game, ai in games(4, 5, 5, 60, solver=True):
+        assert ai.mines <= game.mines
+        assert not ai.safes & game.mines
+        unknown, found = placements(ai, 4, 5, 5)
+        for cell in unknown:
+            assert any(cell in placed for placed in found)
+            assert any(cell not in placed for placed in found)
+
+
+def test_mine_probabilities_match_brute_force():
+    for _, ai in games(4, 5, 5, 60):
+        unknown, found = placements(ai, 4, 5, 5)
+        if not unknown:
+            continue
+        probabilities, other = ai.mine_probabilities()
+        for cell in unknown:
+            expected = sum(cell in placed for placed in found) / len(found)
+            assert abs(probabilities.get(cell, other) - expected) < 1e-9